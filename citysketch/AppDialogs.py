@@ -1,3 +1,5 @@
+from functools import partial
+from importlib.metadata import version, PackageNotFoundError
 import json
 import re
 import sys
@@ -9,8 +11,9 @@ import wx
 from numpy import __version__ as numpy_ver
 
 try:
-    from rasterio import __version__ as rasterio_ver
-except ImportError:
+    # read from the package metadata, importing rasterio is slow
+    rasterio_ver = version('rasterio')
+except PackageNotFoundError:
     rasterio_ver = None
 try:
     from osgeo import __version__ as gdal_ver
@@ -22,6 +25,13 @@ from ._version import __version__
 from .utils import MapProvider
 
 
+# =========================================================================
+
+def _change_value(ctrl, value):
+    """Set text control value without firing EVT_TEXT, only if different"""
+    if ctrl.GetValue() != value:
+        ctrl.ChangeValue(value)
+
 # =========================================================================
 
 class AboutDialog(wx.Dialog):
@@ -134,14 +144,10 @@ class BasemapDialog(wx.Dialog):
     def on_provider_changed(self, event):
         """Handle provider selection change"""
         rb = event.GetEventObject()
-        label = rb.GetStringSelection()
-        for p in MapProvider:
-            if p.value == label:
-                provider = p
-                break
-        else:
+        try:
+            self.provider = MapProvider(rb.GetStringSelection())
+        except ValueError:
             return
-        self.provider = provider
 
     def get_values(self):
         """Get the current values"""
@@ -183,6 +189,11 @@ class CenterLocationDialog(wx.Dialog):
         lon_box.Add(self.lon_ctrl, 1, wx.EXPAND)
         location_sizer.Add(lon_box, 0, wx.EXPAND | wx.ALL, 5)
 
+        # Location last written to the text controls and its text
+        self._shown_location = (self.lat, self.lon)
+        self._shown_text = (self.lat_ctrl.GetValue(),
+                            self.lon_ctrl.GetValue())
+
         # Look up coordinates section
         lookup_label = wx.StaticText(panel, label="Look up coordinates")
         lookup_label.SetFont(lookup_label.GetFont().MakeBold())
@@ -240,8 +251,7 @@ class CenterLocationDialog(wx.Dialog):
 
         for name, lat, lon in locations:
             btn = wx.Button(panel, label=name, size=(90, 28))
-            btn.Bind(wx.EVT_BUTTON,
-                     lambda e, la=lat, lo=lon: self.set_location(la, lo))
+            btn.Bind(wx.EVT_BUTTON, partial(self.on_quick_location, lat, lon))
             quick_grid.Add(btn, 0, wx.EXPAND)
 
         location_sizer.Add(quick_grid, 0, wx.ALL | wx.EXPAND, 5)
@@ -288,10 +298,16 @@ class CenterLocationDialog(wx.Dialog):
         # Center the dialog
         self.Centre()
 
+    def on_quick_location(self, lat, lon, event):
+        """Handle quick location button"""
+        self.set_location(lat, lon)
+
     def set_location(self, lat, lon):
         """Set location in text controls"""
-        self.lat_ctrl.SetValue(f"{lat:.6f}")
-        self.lon_ctrl.SetValue(f"{lon:.6f}")
+        self._shown_location = (lat, lon)
+        self._shown_text = (f"{lat:.6f}", f"{lon:.6f}")
+        _change_value(self.lat_ctrl, self._shown_text[0])
+        _change_value(self.lon_ctrl, self._shown_text[1])
 
     def on_lookup(self, event):
         """Handle place name lookup using Nominatim"""
@@ -405,12 +421,17 @@ class CenterLocationDialog(wx.Dialog):
 
     def get_values(self):
         """Get the current values"""
-        try:
-            lat = float(self.lat_ctrl.GetValue())
-            lon = float(self.lon_ctrl.GetValue())
-        except ValueError:
-            lat = self.lat
-            lon = self.lon
+        text = (self.lat_ctrl.GetValue(), self.lon_ctrl.GetValue())
+        if text == self._shown_text:
+            # not edited, keep full precision
+            lat, lon = self._shown_location
+        else:
+            try:
+                lat = float(text[0])
+                lon = float(text[1])
+            except ValueError:
+                lat = self.lat
+                lon = self.lon
 
         show_marker = self.marker_cb.GetValue()
         return lat, lon, show_marker
@@ -426,6 +447,8 @@ class HeightDialog(wx.Dialog):
 
         self.storey_height = storey_height
         self._updating = False  # Flag to prevent recursive updates
+        self._debounce = wx.Timer(self)  # Delays height validation
+        self._stories_mode = None  # Mode the controls are set up for
 
         sizer = wx.BoxSizer(wx.VERTICAL)
 
@@ -479,6 +502,7 @@ class HeightDialog(wx.Dialog):
         self.height_radio.Bind(wx.EVT_RADIOBUTTON, self.on_mode_changed)
         self.stories_ctrl.Bind(wx.EVT_SPINCTRL, self.on_stories_changed)
         self.height_ctrl.Bind(wx.EVT_TEXT, self.on_height_changed)
+        self.Bind(wx.EVT_TIMER, self.on_height_validate, self._debounce)
 
         # Initialize in stories mode
         self.stories_radio.SetValue(True)
@@ -503,7 +527,7 @@ class HeightDialog(wx.Dialog):
                 self.stories_ctrl.SetValue(stories)
                 # Update height to match exact stories
                 new_height = stories * self.storey_height
-                self.height_ctrl.SetValue(f"{new_height:.1f}")
+                _change_value(self.height_ctrl, f"{new_height:.1f}")
                 self._updating = False
             except ValueError:
                 pass
@@ -513,7 +537,10 @@ class HeightDialog(wx.Dialog):
     def _update_controls_state(self):
         """Update enabled/disabled state of controls based on mode"""
         stories_mode = self.stories_radio.GetValue()
-        
+        if stories_mode == self._stories_mode:
+            return
+        self._stories_mode = stories_mode
+
         # In stories mode: stories enabled, height disabled (shows calculated value)
         # In height mode: stories disabled, height editable
         self.stories_ctrl.Enable(stories_mode)
@@ -540,18 +567,25 @@ class HeightDialog(wx.Dialog):
         stories = self.stories_ctrl.GetValue()
         height = stories * self.storey_height
         self._updating = True
-        self.height_ctrl.SetValue(f"{height:.1f}")
+        _change_value(self.height_ctrl, f"{height:.1f}")
         self._updating = False
 
     def on_height_changed(self, event):
-        """Validate height input (only active in height mode)"""
+        """Schedule height validation once typing pauses"""
         if self._updating:
             return
         
         # In stories mode, height field is disabled so this shouldn't trigger
         if self.stories_radio.GetValue():
             return
-            
+
+        self._debounce.StartOnce(150)
+
+    def on_height_validate(self, event):
+        """Validate height input (only active in height mode)"""
+        if self.stories_radio.GetValue():
+            return
+
         try:
             height = float(self.height_ctrl.GetValue())
             if height < 0:
@@ -4,19 +4,26 @@ CitySketch Application
 A wxPython GUI application for creating and editing CityJSON files with building data.
 """
 
+import base64
+from collections import OrderedDict
+from concurrent.futures import Future
 import copy
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from enum import Enum
+import http.client
+import importlib.util
 import io
 import json
 import math
 import os
 from pathlib import Path
+import queue
 import re
 import sys
 import tempfile
 import time
 import threading
+import urllib.error
 import urllib.parse
 import urllib.request
 import uuid
@@ -25,31 +32,47 @@ from typing import List, Tuple, Optional, cast
 import numpy as np
 import wx
 
-try:
-    import rasterio
-    from rasterio.warp import transform_bounds, reproject, Resampling
-    from rasterio.transform import from_bounds
-    GEOTIFF_SUPPORT = True
-except ImportError:
-    GEOTIFF_SUPPORT = False
+# rasterio is slow to import, it is imported when a GeoTIFF is used
+GEOTIFF_SUPPORT = importlib.util.find_spec('rasterio') is not None
+if not GEOTIFF_SUPPORT:
     print("Warning: GeoTIFF support not available. "
           "Install rasterio for full functionality.")
 
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+try:
+    import ijson
+    IJSON_SUPPORT = True
+except ImportError:
+    IJSON_SUPPORT = False
+
 from ._version import __version__, __version_tuple__
 from .AppDialogs import (AboutDialog, HeightDialog,
                         BasemapDialog, CenterLocationDialog, GeoTiffDialog)
 from .App3dview import OPENGL_SUPPORT, Building3DViewer
 from .AppSettings import colorset, settings, load_settings, save_settings
-from .Building import Building, BuildingGroup
+from .Building import (Building, BuildingGroup, BLOCK_FACES, solid_faces,
+                       merge_vertices)
 from .ColorDialogs import ColorSettingsDialog
 from .GeoJSON import GeoJsonBuilding, GeoJsonBuildingCache, BuildingMerger
 from .austaltxt import load_from_austaltxt, save_to_austaltxt
+from .tiles import lat_lon_to_tile, tile_to_lat_lon
 from .utils import ll2wm, wm2ll, MapProvider, get_location_with_fallback
 
 APP_NAME = "CitySketch"
 APP_VERSION = __version__
 APP_MINOR = '.'.join(str(x) for x in cast(Tuple, __version_tuple__)[0:2])
 FEXT = '.csp'
+# coordinate reference system written to CityJSON files (WGS84)
+CITYJSON_CRS = "https://www.opengis.net/def/crs/EPSG/0/4326"
+# write buffer for saving files in many small chunks
+SAVE_BUFFER_SIZE = 1 << 20
+# files larger than this are read piecewise, if ijson is available
+STREAM_THRESHOLD = 64 << 20
 
 print(f"Starting {APP_NAME} {APP_MINOR} (v{APP_VERSION})")
 
@@ -218,6 +241,185 @@ class SelectMode(Enum):
 
 # =========================================================================
 
+# tile URL templates, {s} is replaced by one of TILE_SERVERS
+TILE_URLS = {
+    MapProvider.OSM:
+        "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+    MapProvider.SATELLITE:
+        "https://server.arcgisonline.com/ArcGIS/rest/services/"
+        "World_Imagery/MapServer/tile/{z}/{y}/{x}",
+    MapProvider.TERRAIN:
+        "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
+    MapProvider.HILLSHADE:
+        "http://services.arcgisonline.com/ArcGIS/rest/services/"
+        "Elevation/World_Hillshade/MapServer/tile/{z}/{y}/{x}",
+}
+TILE_SERVERS = ('a', 'b', 'c')
+
+# open connections of each tile worker, by (scheme, host)
+_TILE_CONNECTIONS = threading.local()
+# proxies configured in the environment, by scheme
+_TILE_PROXIES = urllib.request.getproxies()
+
+
+def _open_tile_connection(scheme: str, netloc: str, timeout: float):
+    """Open a connection to a tile server, through the proxy
+    configured for the scheme unless the server bypasses it.
+
+    :return: the connection, the headers to send on it, and
+        whether requests must name the absolute URL
+    """
+    proxy = _TILE_PROXIES.get(scheme)
+    host = urllib.parse.urlsplit(f"//{netloc}").hostname
+    if not proxy or urllib.request.proxy_bypass(host):
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(netloc, timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=timeout)
+        return conn, {}, False
+
+    if '://' not in proxy:
+        proxy = f"http://{proxy}"
+    proxy = urllib.parse.urlsplit(proxy)
+    headers = {}
+    if proxy.username is not None:
+        credentials = (f"{urllib.parse.unquote(proxy.username)}:"
+                       f"{urllib.parse.unquote(proxy.password or '')}")
+        headers['Proxy-Authorization'] = "Basic " + base64.b64encode(
+            credentials.encode()).decode('ascii')
+    if scheme == 'https':
+        # TLS to the tile server through a CONNECT tunnel
+        conn = http.client.HTTPSConnection(proxy.hostname, proxy.port,
+                                           timeout=timeout)
+        conn.set_tunnel(netloc, headers=headers)
+        return conn, {}, False
+    conn = http.client.HTTPConnection(proxy.hostname, proxy.port,
+                                      timeout=timeout)
+    return conn, headers, True
+
+
+def _fetch_tile(url: str, timeout: float = 5, redirects: int = 5) -> bytes:
+    """Download a tile, reusing a keep-alive connection
+    of the calling thread to the same server"""
+    headers = {'User-Agent': f'{APP_NAME}/{APP_MINOR}'}
+    connections = _TILE_CONNECTIONS.__dict__
+    while True:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        entry = connections.pop(key, None)
+        reused = entry is not None
+        if not reused:
+            entry = _open_tile_connection(parts.scheme, parts.netloc,
+                                          timeout)
+        conn, extra_headers, absolute = entry
+        if absolute:
+            target = urllib.parse.urlunsplit(parts._replace(fragment=''))
+        else:
+            target = parts.path + (f"?{parts.query}" if parts.query else "")
+        try:
+            conn.request('GET', target, headers={**headers, **extra_headers})
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.BadStatusLine, ConnectionResetError):
+            conn.close()
+            if reused:
+                # the server closed the idle connection, open a new one
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            connections[key] = entry
+
+        location = response.getheader('Location')
+        if response.status in (301, 302, 303, 307, 308) and location \
+                and redirects:
+            url = urllib.parse.urljoin(url, location)
+            redirects -= 1
+            continue
+        if response.status != 200:
+            raise urllib.error.HTTPError(url, response.status,
+                                         response.reason,
+                                         response.headers, None)
+        return data
+
+
+def _close_tile_connections():
+    """Close the open tile server connections of the calling thread"""
+    connections = _TILE_CONNECTIONS.__dict__
+    for conn, _, _ in connections.values():
+        conn.close()
+    connections.clear()
+
+
+class TileLoader:
+    """Runs tile downloads on a bounded number of worker threads.
+
+    The workers are daemon threads: unlike the workers of a
+    ThreadPoolExecutor they are not joined when the interpreter exits,
+    so a download in flight never delays closing the application.
+    """
+
+    def __init__(self, max_workers: int = 16):
+        self.max_workers = max_workers
+        self._jobs = queue.SimpleQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, fn) -> Future:
+        """Queue a call of fn, return the Future of its result.
+
+        After shutdown, the Future returned is cancelled already.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.cancel()
+                return future
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True,
+                                          name=f"tile-{len(self._workers)}")
+                worker.start()
+                self._workers.append(worker)
+            self._jobs.put((future, fn))
+        return future
+
+    def shutdown(self):
+        """Cancel the queued calls and stop the workers
+        without waiting for the calls that are running"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                future, fn = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+        for _ in self._workers:
+            self._jobs.put(None)
+
+    def _work(self):
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, fn = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = fn()
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            _close_tile_connections()
+
 class TileCache:
     """Simple tile cache for map tiles"""
 
@@ -227,40 +429,54 @@ class TileCache:
                                      'cityjson_tiles')
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
-        self.memory_cache = {}
+        # decoded tiles, least recently used first
+        self.memory_cache: OrderedDict[Tuple, wx.Image] = OrderedDict()
         self.max_memory_tiles = 100
+        # tiles are fetched from several loader threads
+        self._lock = threading.Lock()
+        # provider: set of (z, x, y) of the tiles stored on disk
+        self._disk_index = {}
+        # provider: directory of its tiles, created once up front
+        self._provider_dirs = {}
+        for provider in TILE_URLS:
+            provider_dir = os.path.join(cache_dir, provider.value)
+            os.makedirs(provider_dir, exist_ok=True)
+            self._provider_dirs[provider] = provider_dir
 
     def get_cache_path(self, provider, z, x, y):
         """Get the file path for a cached tile"""
-        provider_dir = os.path.join(self.cache_dir, provider.value)
-        os.makedirs(provider_dir, exist_ok=True)
-        return os.path.join(provider_dir, f"{z}_{x}_{y}.png")
+        return f"{self._provider_dirs[provider]}{os.sep}{z}_{x}_{y}.png"
 
     def get_tile(self, provider, z, x, y):
         """Get a tile from cache"""
         key = (provider, z, x, y)
 
         # Check memory cache
-        if key in self.memory_cache:
-            return self.memory_cache[key]
+        with self._lock:
+            image = self.memory_cache.get(key)
+            if image is not None:
+                self.memory_cache.move_to_end(key)
+                return image
 
         # Check disk cache
-        cache_path = self.get_cache_path(provider, z, x, y)
-        if os.path.exists(cache_path):
+        on_disk = self._disk_tiles(provider)
+        if (z, x, y) in on_disk:
+            cache_path = self.get_cache_path(provider, z, x, y)
             try:
                 with open(cache_path, 'rb') as f:
                     data = f.read()
                 image = wx.Image(io.BytesIO(data))
+                if not image.IsOk():
+                    # download it again instead of decoding it every time
+                    on_disk.discard((z, x, y))
+                    return None
 
                 # Add to memory cache
-                if len(self.memory_cache) >= self.max_memory_tiles:
-                    # Remove oldest items
-                    for _ in range(20):
-                        self.memory_cache.pop(
-                            next(iter(self.memory_cache)))
-                self.memory_cache[key] = image
+                self._remember(key, image)
 
                 return image
+            except FileNotFoundError:
+                on_disk.discard((z, x, y))
             except:
                 pass
 
@@ -270,21 +486,52 @@ class TileCache:
         """Save a tile to cache"""
         cache_path = self.get_cache_path(provider, z, x, y)
         try:
+            # decode once, and keep undecodable responses off the disk
+            image = wx.Image(io.BytesIO(data))
+            if not image.IsOk():
+                return None
+
             with open(cache_path, 'wb') as f:
                 f.write(data)
+            self._disk_tiles(provider).add((z, x, y))
 
             # Also add to memory cache
-            image = wx.Image(io.BytesIO(data))
-            key = (provider, z, x, y)
-            if len(self.memory_cache) >= self.max_memory_tiles:
-                for _ in range(20):
-                    self.memory_cache.pop(next(iter(self.memory_cache)))
-            self.memory_cache[key] = image
+            self._remember((provider, z, x, y), image)
 
             return image
         except:
             return None
 
+    def _disk_tiles(self, provider):
+        """Get the set of tiles on disk, scanning the directory once"""
+        with self._lock:
+            tiles = self._disk_index.get(provider)
+            if tiles is None:
+                tiles = set()
+                try:
+                    with os.scandir(self._provider_dirs[provider]) as entries:
+                        for entry in entries:
+                            name, ext = os.path.splitext(entry.name)
+                            try:
+                                z, x, y = (int(v) for v in name.split('_'))
+                            except ValueError:
+                                continue
+                            if ext == '.png':
+                                tiles.add((z, x, y))
+                except (KeyError, FileNotFoundError):
+                    # no tile server or the directory was removed
+                    pass
+                self._disk_index[provider] = tiles
+            return tiles
+
+    def _remember(self, key, image):
+        """Add a tile to the memory cache, evicting the least recent one"""
+        with self._lock:
+            self.memory_cache[key] = image
+            self.memory_cache.move_to_end(key)
+            while len(self.memory_cache) > self.max_memory_tiles:
+                self.memory_cache.popitem(last=False)
+
 # =========================================================================
 
 class GeoTiffLayer:
@@ -308,6 +555,9 @@ class GeoTiffLayer:
             raise RuntimeError("GeoTIFF support not available. "
                                "Please install gdal and rasterio.")
 
+        import rasterio
+        from rasterio.warp import transform_bounds
+
         try:
             with rasterio.open(filepath) as src:
                 print(f"Loading GeoTIFF: {filepath}")
@@ -412,6 +662,9 @@ class GeoTiffLayer:
         if not GEOTIFF_SUPPORT or self.data is None:
             return False
 
+        from rasterio.warp import reproject, Resampling
+        from rasterio.transform import from_bounds
+
         try:
             print(f"Reprojecting for display:")
             print(f"Target bounds: {target_bounds}")
@@ -728,6 +981,11 @@ class MapCanvas(wx.Panel):
 
     BASE_TILE_SIZE = 256
     BASE_GEO_ZOOM = 16
+    # range of tile zoom levels chosen for the view
+    MIN_GEO_ZOOM = 11
+    MAX_GEO_ZOOM = 19
+    # shortest time between two repaints in seconds
+    REFRESH_INTERVAL = 1 / 60
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -747,8 +1005,16 @@ class MapCanvas(wx.Panel):
         # Map state
         self.map_provider = MapProvider.NONE
         self.tile_cache = TileCache()
-        self.tiles_loading = set()
-        self.map_tiles = {}  # (z,x,y): wx.Image
+        # workers for tile downloads, limits the number of
+        # simultaneous connections to the tile servers
+        self.tile_loader = TileLoader()
+        self.tiles_loading = {}  # (z,x,y): (Future, prefetch)
+        # (z,x,y): wx.Image, least recently drawn first
+        self.map_tiles: OrderedDict[Tuple, wx.Image] = OrderedDict()
+        self.max_map_tiles = 128
+        # (z,x,y): (wx.Image, size, wx.Bitmap, quality)
+        # of tiles scaled for display
+        self.tile_bitmaps = {}
 
         # GeoTIFF layer - ADD THIS
         self.geotiff_layer = GeoTiffLayer()
@@ -779,6 +1045,43 @@ class MapCanvas(wx.Panel):
         self.selection_rect_start = None
         self.current_mouse_pos = None
         self._drag_state_saved = False  # Track if we saved state for current drag
+        self._refresh_pending = False  # repaint already scheduled
+        self._dirty_rect = None  # area to repaint, None for all
+        self._last_refresh = 0.  # time.monotonic() of the last repaint
+        # map, grid and buildings as last drawn, overlays go on top
+        self._scene_bitmap = None
+        self._scene_dirty = True
+        self._overlay_rect = None  # area of the overlay at the mouse
+        self._ctrl_down = False  # handles are drawn for rotation
+        self._last_motion = None  # position and modifiers of last motion
+        self._view_status = None  # zoom and pan shown in the status bar
+        self._label_font = wx.Font(10, wx.FONTFAMILY_DEFAULT,
+                                   wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+
+        # incremented by buildings_changed() whenever buildings are
+        # added, removed or reshaped
+        self._geometry_version = 0
+        # Flat copy of all building corners for vectorized queries,
+        # rebuilt lazily by _update_building_arrays()
+        self._geometry_key = None
+        self._corner_xy = np.empty((0, 2), dtype=np.float64)
+        self._corner_owner = np.empty(0, dtype=np.intp)
+        # building i owns corners _corner_start[i] to _corner_start[i+1]-1
+        self._corner_start = np.zeros(1, dtype=np.intp)
+        self._building_row = {}  # id(building): index in self.buildings
+        self._bx = np.empty((0, 4), dtype=np.float32)  # le, lo, ri, up
+        # uniform grid: (cell_i, cell_j): indices of buildings overlapping
+        self._grid = {}
+        self._grid_size = 100.0
+        # building outlines, label positions and surrounding rectangles
+        # (left, top, right, bottom) in screen coordinates
+        self._screen_key = None
+        self._screen_outlines = []
+        self._screen_centers = []
+        self._screen_boxes = np.empty((0, 4), dtype=np.float64)
+        # grid line positions on the screen
+        self._grid_lines_key = None
+        self._grid_lines = ([], [])
 
         # Setup
         self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
@@ -788,6 +1091,12 @@ class MapCanvas(wx.Panel):
         self.Bind(wx.EVT_MOTION, self.on_mouse_motion)
         self.Bind(wx.EVT_MOUSEWHEEL, self.on_mouse_wheel)
         self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_DPI_CHANGED, self.on_size)
+
+        # map tiles are resampled fast while zooming, well afterwards
+        self._zooming = False
+        self._zoom_settle = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_zoom_settled, self._zoom_settle)
 
         self.SetMinSize((800, 600))
         self.SetBackgroundColour(wx.WHITE)
@@ -810,6 +1119,15 @@ class MapCanvas(wx.Panel):
         sy = size_y - plot_y
         return sx, sy
 
+    def world_to_screen_array(self, xy: np.ndarray) -> np.ndarray:
+        """Convert (n, 2) array of world coordinates to screen coordinates"""
+        size_x, size_y = self.GetSize()
+        # the transform has no rotation, so scale and offset
+        # per axis are the whole affine matrix
+        scale = np.array((self.zoom_level, -self.zoom_level))
+        offset = np.array((self.pan_x, size_y + self.pan_y))
+        return xy * scale + offset
+
     def geo_to_world(self, lat: float, lon: float) -> Tuple[float, float]:
         """
         Convert geographic coordinates (WGS84) to world coordinates (Web Mercator).
@@ -868,6 +1186,127 @@ class MapCanvas(wx.Panel):
             raise ValueError(f"Invalid choice of coords = {coords}")
 
 
+    def circle_corners_changed(self):
+        """Rebuild the outlines of the cylindrical buildings
+        after the number of circle corners was changed"""
+        for building in self.buildings:
+            if building.a <= 0:
+                building.reset_corners()
+        self.buildings_changed()
+        self.refresh_idle()
+
+    def buildings_changed(self):
+        """Note that buildings were added, removed or reshaped,
+        so the arrays derived from them are rebuilt"""
+        self._geometry_version += 1
+
+    def _update_building_arrays(self):
+        """Rebuild the corner arrays if any building has changed"""
+        key = self._geometry_version
+        if key == self._geometry_key:
+            return
+        corners = [b.get_corner_array() for b in self.buildings]
+        if corners:
+            self._corner_xy = np.concatenate(corners)
+        else:
+            self._corner_xy = np.empty((0, 2), dtype=np.float64)
+        counts = [len(bc) for bc in corners]
+        self._corner_owner = np.repeat(
+            np.arange(len(corners), dtype=np.intp), counts)
+        self._corner_start = np.concatenate(
+            ([0], np.cumsum(counts, dtype=np.intp)))
+        self._building_row = {id(b): i for i, b in enumerate(self.buildings)}
+
+        # surrounding rectangles and grid index
+        self._grid = {}
+        if corners:
+            starts = self._corner_start[:-1]
+            # single precision is plenty for coordinates relative to
+            # the center, rounded outward so the rectangles still
+            # enclose all corners
+            lower = np.minimum.reduceat(self._corner_xy, starts)
+            upper = np.maximum.reduceat(self._corner_xy, starts)
+            self._bx = np.hstack((
+                np.nextafter(lower.astype(np.float32), np.float32(-np.inf)),
+                np.nextafter(upper.astype(np.float32), np.float32(np.inf))))
+            cells = np.floor(self._bx / self._grid_size).astype(int)
+            for row, (i0, j0, i1, j1) in enumerate(cells.tolist()):
+                for ci in range(i0, i1 + 1):
+                    for cj in range(j0, j1 + 1):
+                        self._grid.setdefault((ci, cj), []).append(row)
+        else:
+            self._bx = np.empty((0, 4), dtype=np.float32)
+        self._geometry_key = key
+
+    def export_vertices_boundaries(self) -> Tuple[np.ndarray, List[list]]:
+        """
+        Get the solids of all buildings for export.
+
+        :returns: vertices of all buildings as (n, 3) array
+            and for each building the list of its faces
+            as indices into the vertices
+        """
+        self._update_building_arrays()
+        owner = self._corner_owner
+        counts = np.bincount(owner, minlength=len(self.buildings))
+        starts = np.cumsum(counts) - counts
+        heights = np.array([b.height for b in self.buildings],
+                           dtype=np.float64)
+
+        # each building contributes its bottom, then its top corners
+        bottom = np.arange(len(owner)) + starts[owner]
+        top = bottom + counts[owner]
+        vertices = np.zeros((2 * len(owner), 3), dtype=np.float64)
+        vertices[bottom, :2] = self._corner_xy
+        vertices[top, :2] = self._corner_xy
+        vertices[top, 2] = heights[owner]
+
+        offsets = 2 * starts
+        boundaries = [[] for _ in self.buildings]
+        blocks = np.flatnonzero(counts == 4)
+        block_faces = (BLOCK_FACES[None, :, :] +
+                       offsets[blocks, None, None]).tolist()
+        for row, faces in zip(blocks.tolist(), block_faces):
+            boundaries[row] = faces
+        for row in np.flatnonzero(counts != 4).tolist():
+            offset = int(offsets[row])
+            boundaries[row] = [[i + offset for i in face]
+                               for face in solid_faces(int(counts[row]))]
+        return vertices, boundaries
+
+    def _grid_rows(self, x1: float, y1: float, x2: float, y2: float
+                   ) -> List[int]:
+        """Indices of buildings in grid cells overlapping a world rectangle"""
+        gs = self._grid_size
+        i0, i1 = int(x1 // gs), int(x2 // gs)
+        j0, j1 = int(y1 // gs), int(y2 // gs)
+        rows = set()
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._grid):
+            for (ci, cj), cell in self._grid.items():
+                if i0 <= ci <= i1 and j0 <= cj <= j1:
+                    rows.update(cell)
+        else:
+            for ci in range(i0, i1 + 1):
+                for cj in range(j0, j1 + 1):
+                    rows.update(self._grid.get((ci, cj), ()))
+        return sorted(rows)
+
+    def building_at(self, x: float, y: float) -> Optional[Building]:
+        """Return the topmost building containing world point x, y"""
+        self._update_building_arrays()
+        gs = self._grid_size
+        rows = self._grid.get((int(x // gs), int(y // gs)))
+        if not rows:
+            return None
+        # only buildings whose rectangle holds the point need ray casting
+        rows = np.asarray(rows, dtype=np.intp)
+        le, lo, ri, up = self._bx[rows].T
+        inside = (le <= x) & (x <= ri) & (lo <= y) & (y <= up)
+        for row in reversed(rows[inside].tolist()):
+            if self.buildings[row].contains_point(x, y):
+                return self.buildings[row]
+        return None
+
     def snap_point(self, x: float, y: float,
                    exclude: Optional[Building | BuildingGroup] = None
                    ) -> Tuple[float, float]:
@@ -875,77 +1314,77 @@ class MapCanvas(wx.Panel):
         if not self.snap_enabled:
             return x, y
 
-        # make `in` work for single buidling
         if exclude is None:
             exclude = []
         elif isinstance(exclude, Building):
             exclude = [exclude]
 
+        # while dragging, only the (excluded) selection moves,
+        # so the arrays from the start of the drag remain valid
+        if self.drag_mode is None:
+            self._update_building_arrays()
+
         snap_threshold = 15 / self.zoom_level
-        best_x, best_y = x, y
-        best_dist = snap_threshold
 
-        for building in self.buildings:
-            if building in exclude:
-                continue
+        # only buildings in grid cells within reach can provide a corner
+        excluded = {self._building_row.get(id(b)) for b in exclude}
+        rows = [r for r in self._grid_rows(
+                    x - snap_threshold, y - snap_threshold,
+                    x + snap_threshold, y + snap_threshold)
+                if r not in excluded]
+        if not rows:
+            return x, y
+        # drop buildings whose surrounding rectangle is out of reach
+        rows = np.asarray(rows, dtype=np.intp)
+        le, lo, ri, up = self._bx[rows].T
+        dx = np.maximum(np.maximum(le - x, x - ri), 0.)
+        dy = np.maximum(np.maximum(lo - y, y - up), 0.)
+        rows = rows[dx ** 2 + dy ** 2 < snap_threshold ** 2]
+        if len(rows) == 0:
+            return x, y
+        # corner indices and the index of the following corner
+        # on the outline, which closes the ring of each building
+        first = self._corner_start[rows]
+        counts = self._corner_start[rows + 1] - first
+        offsets = np.cumsum(counts) - counts
+        idx = np.repeat(first - offsets, counts) + np.arange(counts.sum())
+        nxt = idx + 1
+        nxt[offsets + counts - 1] = first
+        xy = self._corner_xy[idx]
+
+        # Snap to corners
+        d2 = (xy[:, 0] - x) ** 2 + (xy[:, 1] - y) ** 2
+        i = int(np.argmin(d2))
+        if d2[i] < snap_threshold ** 2:
+            return float(xy[i, 0]), float(xy[i, 1])
+
+        # Snap to edges: nearest point on each edge segment
+        edge = self._corner_xy[nxt] - xy
+        length2 = (edge ** 2).sum(axis=1)
+        t = ((x - xy[:, 0]) * edge[:, 0] + (y - xy[:, 1]) * edge[:, 1])
+        t = np.clip(t / np.where(length2 > 0, length2, 1.), 0., 1.)
+        foot = xy + t[:, None] * edge
+        d2 = (foot[:, 0] - x) ** 2 + (foot[:, 1] - y) ** 2
+        i = int(np.argmin(d2))
+        if d2[i] < snap_threshold ** 2:
+            return float(foot[i, 0]), float(foot[i, 1])
 
-            # Snap to corners
-            for cx, cy in building.get_corners():
-                dist = math.sqrt((x - cx) ** 2 + (y - cy) ** 2)
-                if dist < best_dist:
-                    best_x, best_y = cx, cy
-                    best_dist = dist
-
-            # TODO Snap to edges
-            # if abs(x - building.x1) < best_dist:
-            #     best_x = building.x1
-            #     best_dist = abs(x - building.x1)
-            # if abs(x - building.x2) < best_dist:
-            #     best_x = building.x2
-            #     best_dist = abs(x - building.x2)
-            # if abs(y - building.y1) < best_dist:
-            #     best_y = building.y1
-            #     best_dist = abs(y - building.y1)
-            # if abs(y - building.y2) < best_dist:
-            #     best_y = building.y2
-            #     best_dist = abs(y - building.y2)
-
-        return best_x, best_y
-
-    def lat_lon_to_tile(self, lat, lon, zoom):
-        """Convert lat/lon to tile coordinates"""
-        lat_rad = math.radians(lat)
-        n = 2.0 ** zoom
-        x = (lon + 180.0) / 360.0 * n
-        y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
         return x, y
 
-    def tile_to_lat_lon(self, x, y, zoom):
-        """Convert tile coordinates to lat/lon"""
-        n = 2.0 ** zoom
-        lon = x / n * 360.0 - 180.0
-        lat_rad = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
-        lat = math.degrees(lat_rad)
-        return lat, lon
-
     def get_tile_url(self, provider, z, x, y):
         """Get the URL for a tile"""
-        if provider == MapProvider.OSM:
-            servers = ['a', 'b', 'c']
-            server = servers[abs(hash((x, y))) % len(servers)]
-            return f"https://{server}.tile.openstreetmap.org/{z}/{x}/{y}.png"
-        elif provider == MapProvider.SATELLITE:
-            return f"https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
-        elif provider == MapProvider.TERRAIN:
-            servers = ['a', 'b', 'c']
-            server = servers[abs(hash((x, y))) % len(servers)]
-            return f"https://{server}.tile.opentopomap.org/{z}/{x}/{y}.png"
-        elif provider == MapProvider.HILLSHADE:
-            return f"http://services.arcgisonline.com/ArcGIS/rest/services/Elevation/World_Hillshade/MapServer/tile/{z}/{y}/{x}"
-        return None
+        template = TILE_URLS.get(provider)
+        if template is None:
+            return None
+        server = TILE_SERVERS[(x ^ y) % len(TILE_SERVERS)]
+        return template.format(s=server, z=z, x=x, y=y)
 
-    def load_tile_async(self, provider, z, x, y):
-        """Load a tile asynchronously"""
+    def load_tile_async(self, provider, z, x, y, prefetch=False):
+        """Load a tile asynchronously, return the Future of the request.
+
+        Tiles that are prefetched, i.e. not yet visible,
+        do not show the busy cursor.
+        """
 
         def load():
             try:
@@ -957,38 +1396,52 @@ class MapCanvas(wx.Panel):
 
                 url = self.get_tile_url(provider, z, x, y)
                 if url:
-                    req = urllib.request.Request(url, headers={
-                        'User-Agent': f'{APP_NAME}/{APP_MINOR}'
-                    })
-                    with urllib.request.urlopen(req,
-                                                timeout=5) as response:
-                        data = response.read()
-
+                    data = _fetch_tile(url)
                     image = self.tile_cache.save_tile(provider, z, x, y,
                                                       data)
                     if image:
                         wx.CallAfter(self.on_tile_loaded, provider, z, x,
                                      y, image)
             except Exception as e:
-                self.statusbar.SetStatusText(
-                    f"Failed to load tile {z}/{x}/{y}: {e}")
-            finally:
-                wx.CallAfter(self.on_tile_load_complete, z, x, y)
+                wx.CallAfter(self.statusbar.SetStatusText,
+                             f"Failed to load tile {z}/{x}/{y}: {e}")
 
-        thread = threading.Thread(target=load)
-        thread.daemon = True
-        thread.start()
+        future = self.tile_loader.submit(load)
+        future.add_done_callback(lambda done: wx.CallAfter(
+            self.on_tile_load_complete, z, x, y, done, prefetch))
+        return future
 
     def on_tile_loaded(self, provider, z, x, y, image):
         """Called when a tile has been loaded"""
         if provider == self.map_provider:
             self.map_tiles[(z, x, y)] = image
-            self.Refresh()
+            while len(self.map_tiles) > self.max_map_tiles:
+                self.map_tiles.popitem(last=False)
+            self.refresh_idle()
 
-    def on_tile_load_complete(self, z, x, y):
+    def on_tile_load_complete(self, z, x, y, future, prefetch=False):
         """Called when tile loading is complete"""
-        self.tiles_loading.discard((z, x, y))
-        wx.EndBusyCursor()
+        # requests dropped by clear_tiles or superseded by a newer
+        # request for the same tile have been accounted for already
+        if not self:  # canvas may have been destroyed meanwhile
+            return
+        entry = self.tiles_loading.get((z, x, y))
+        if entry is None or entry[0] is not future:
+            return
+        del self.tiles_loading[(z, x, y)]
+        if not prefetch:
+            wx.EndBusyCursor()
+
+    def clear_tiles(self):
+        """Forget all displayed tiles and drop queued tile requests"""
+        for future, prefetch in self.tiles_loading.values():
+            # downloads already running are left to finish unnoticed
+            future.cancel()
+            if not prefetch:
+                wx.EndBusyCursor()
+        self.tiles_loading.clear()
+        self.map_tiles.clear()
+        self.tile_bitmaps.clear()
 
     # def geo_to_world(self, lat, lon):
     #     """Convert geographic coordinates to world coordinates - FIXED VERSION"""
@@ -1059,7 +1512,7 @@ class MapCanvas(wx.Panel):
                           "No Buildings",
                           wx.OK | wx.ICON_INFORMATION)
 
-        self.Refresh()
+        self.refresh_idle()
 
     def is_duplicate_building(self, coords, height):
         """Check if building already exists in project"""
@@ -1097,7 +1550,7 @@ class MapCanvas(wx.Panel):
             # Hide GeoJSON buildings and update button even when nothing imported
             self.geojson_mode = 'hidden'
             self.main_frame.geojson_btn.SetLabel("GeoJSON: Show")
-            self.Refresh()
+            self.refresh_idle()
             return 0
 
         # Save state before import
@@ -1124,6 +1577,7 @@ class MapCanvas(wx.Panel):
                     # Update UI in main thread
                     wx.CallAfter(lambda b=building, gb=geojson_building: (
                         self.buildings.append(b),
+                        self.buildings_changed(),
                         imported.append(gb)
                     ))
 
@@ -1164,13 +1618,13 @@ class MapCanvas(wx.Panel):
         self._update_undo_menu_state()
 
         # Update UI
-        self.Refresh()
+        self.refresh_idle()
 
         return len(imported)
 
     def export_selected_to_geojson(self):
         """Export selected CitySketch buildings to GeoJSON format"""
-        selected = [b for b in self.buildings if b.selected]
+        selected = self.selected_buildings.buildings
 
         if not selected:
             wx.MessageBox("No buildings selected for export",
@@ -1249,7 +1703,7 @@ class MapCanvas(wx.Panel):
             self.geojson_mode = 'hidden'
             self.main_frame.geojson_btn.SetLabel("GeoJSON: Show")
 
-        self.Refresh()
+        self.refresh_idle()
 
     def draw_geojson_buildings(self, gc):
         """Draw GeoJSON buildings"""
@@ -1290,6 +1744,46 @@ class MapCanvas(wx.Panel):
     def on_paint(self, event):
         """Handle paint events"""
         dc = wx.AutoBufferedPaintDC(self)
+
+        # Redraw the scene only if it has changed
+        if self._scene_bitmap is None:
+            self._create_scene_bitmap()
+        if self._scene_dirty:
+            scene_dc = wx.MemoryDC(self._scene_bitmap)
+            self.draw_scene(scene_dc)
+            scene_dc.SelectObject(wx.NullBitmap)
+            self._scene_dirty = False
+        dc.DrawBitmap(self._scene_bitmap, 0, 0)
+
+        # Draw overlays
+        gc = wx.GraphicsContext.Create(dc)
+
+        if len(self.selected_buildings) > 0:
+            if len(self.selected_buildings) > 1:
+                self.draw_selected_rectangle(gc)
+            self.draw_selected_handles(gc)
+
+        # Draw preview for new building
+        if (self.mode in [SelectMode.ADD_BUILDING, SelectMode.ADD_ROTUNDA]
+                and self.floating_rect and self.current_mouse_pos):
+            if self.mode == SelectMode.ADD_BUILDING:
+                self.draw_building_preview(gc, mode='corner')
+            elif self.mode == SelectMode.ADD_ROTUNDA:
+                self.draw_building_preview(gc, mode='center')
+            else:
+                pass
+
+        # Draw selection rectangle
+        if (self.mode == SelectMode.RECTANGLE_SELECT
+                and self.selection_rect_start and self.current_mouse_pos):
+            self.draw_selection_rectangle(gc)
+
+        # Draw center location marker
+        if self.show_center_marker:
+            self.draw_center_marker(gc)
+
+    def draw_scene(self, dc):
+        """Draw map, grid and buildings"""
         dc.SetBackground(wx.Brush(wx.WHITE))
         dc.Clear()
 
@@ -1313,8 +1807,8 @@ class MapCanvas(wx.Panel):
         # tile_size = meters_per_tile * zoom_level
         # For tile_size ≈ 256: zoom_level ≈ 256 / meters_per_tile = 256 * 2^z / 40075016.686
         EARTH_CIRCUMFERENCE = 40075016.686
-        self.geo_zoom = 11
-        while self.geo_zoom < 19:
+        self.geo_zoom = self.MIN_GEO_ZOOM
+        while self.geo_zoom < self.MAX_GEO_ZOOM:
             meters_per_tile = EARTH_CIRCUMFERENCE / (2 ** self.geo_zoom)
             tile_size_pixels = meters_per_tile * self.zoom_level
             if tile_size_pixels <= 512:
@@ -1322,42 +1816,20 @@ class MapCanvas(wx.Panel):
             self.geo_zoom += 1
 
         if self.statusbar is not None:
-            self.statusbar.SetStatusText(
-                f"Zoom level {self.geo_zoom:2d}  "
-                f"factor {self.zoom_level:3.2f} "
-                f"Pan: {self.pan_x:7.1f} {self.pan_y:7.1f}",  i=2)
+            text = (f"Zoom level {self.geo_zoom:2d}  "
+                    f"factor {self.zoom_level:3.2f} "
+                    f"Pan: {self.pan_x:7.1f} {self.pan_y:7.1f}")
+            # setting the text repaints the status bar, even if unchanged
+            if text != self._view_status:
+                self.statusbar.SetStatusText(text, i=2)
+                self._view_status = text
 
         # Draw buildings
-        for building in self.buildings:
-            self.draw_building(gc, building)
+        self.draw_buildings(gc)
 
         # Draw GeoJSON buildings
         self.draw_geojson_buildings(gc)
 
-        if len(self.selected_buildings) > 0:
-            if len(self.selected_buildings) > 1:
-                self.draw_selected_rectangle(gc)
-            self.draw_selected_handles(gc)
-
-        # Draw preview for new building
-        if (self.mode in [SelectMode.ADD_BUILDING, SelectMode.ADD_ROTUNDA]
-                and self.floating_rect and self.current_mouse_pos):
-            if self.mode == SelectMode.ADD_BUILDING:
-                self.draw_building_preview(gc, mode='corner')
-            elif self.mode == SelectMode.ADD_ROTUNDA:
-                self.draw_building_preview(gc, mode='center')
-            else:
-                pass
-
-        # Draw selection rectangle
-        if (self.mode == SelectMode.RECTANGLE_SELECT
-                and self.selection_rect_start and self.current_mouse_pos):
-            self.draw_selection_rectangle(gc)
-
-        # Draw center location marker
-        if self.show_center_marker:
-            self.draw_center_marker(gc)
-
     def draw_map_tiles(self, dc):
         """Draw map tiles as background.
         
@@ -1374,7 +1846,7 @@ class MapCanvas(wx.Panel):
         # Screen pixels per tile: meters_per_tile * zoom_level (pixels per meter)
         tile_size = meters_per_tile * self.zoom_level
 
-        center_tile_x, center_tile_y = self.lat_lon_to_tile(
+        center_tile_x, center_tile_y = lat_lon_to_tile(
             self.geo_center_lat, self.geo_center_lon, self.geo_zoom
         )
 
@@ -1390,42 +1862,101 @@ class MapCanvas(wx.Panel):
 
         tiles_x = math.ceil(width / tile_size) + 2
         tiles_y = math.ceil(height / tile_size) + 2
+        # keep the view, its prefetched surroundings and some history
+        self.max_map_tiles = max(128, 4 * tiles_x * tiles_y)
 
         start_tile_x = floor_x - math.ceil(offset_x / tile_size)
         start_tile_y = floor_y - math.ceil(offset_y / tile_size)
 
-
-        for tile_y in range(start_tile_y, start_tile_y + tiles_y):
-            for tile_x in range(start_tile_x, start_tile_x + tiles_x):
-
-                max_tile = 2 ** self.geo_zoom
-                if tile_x < 0 or tile_x >= max_tile or tile_y < 0 or tile_y >= max_tile:
-                    continue
-
-                screen_x = offset_x + (tile_x - floor_x) * tile_size
-                screen_y = offset_y + (tile_y - floor_y) * tile_size
-
-                tile_key = (self.geo_zoom, tile_x, tile_y)
-                if tile_key in self.map_tiles:
-                    image = self.map_tiles[tile_key]
-                    scaled = image.Scale(int(tile_size), int(tile_size),
-                                        wx.IMAGE_QUALITY_HIGH)
-                    bitmap = wx.Bitmap(scaled)
-                    dc.DrawBitmap(bitmap, int(screen_x), int(screen_y))
-                else:
-                    dc.SetBrush(wx.Brush(
-                        colorset.get('COL_TILE_EMPTY')))
-                    dc.SetPen(
-                        wx.Pen(
-                            colorset.get('COL_TILE_EDGE'), 1))
-                    dc.DrawRectangle(int(screen_x), int(screen_y),
-                                     int(tile_size), int(tile_size))
-
-                    if tile_key not in self.tiles_loading:
-                        wx.BeginBusyCursor()
-                        self.tiles_loading.add(tile_key)
-                        self.load_tile_async(self.map_provider,
-                                             self.geo_zoom, tile_x, tile_y)
+        # tiles in view, skipping those beyond the edges of the map
+        max_tile = 2 ** self.geo_zoom
+        grid_x, grid_y = np.meshgrid(
+            np.arange(start_tile_x, start_tile_x + tiles_x),
+            np.arange(start_tile_y, start_tile_y + tiles_y))
+        valid = ((grid_x >= 0) & (grid_x < max_tile) &
+                 (grid_y >= 0) & (grid_y < max_tile))
+        grid_x = grid_x[valid]
+        grid_y = grid_y[valid]
+        grid_sx = (offset_x + (grid_x - floor_x) * tile_size).astype(int)
+        grid_sy = (offset_y + (grid_y - floor_y) * tile_size).astype(int)
+
+        # resample fast while the zoom changes
+        quality = (wx.IMAGE_QUALITY_NORMAL if self._zooming
+                   else wx.IMAGE_QUALITY_HIGH)
+        visible = set()
+        for tile_x, tile_y, screen_x, screen_y in zip(
+                grid_x.tolist(), grid_y.tolist(),
+                grid_sx.tolist(), grid_sy.tolist()):
+            tile_key = (self.geo_zoom, tile_x, tile_y)
+            visible.add(tile_key)
+            if tile_key in self.map_tiles:
+                self.map_tiles.move_to_end(tile_key)
+                image = self.map_tiles[tile_key]
+                size = int(tile_size)
+                cached = self.tile_bitmaps.get(tile_key)
+                if (cached is None or cached[0] is not image
+                        or cached[1] != size
+                        or (cached[3] != quality and not self._zooming)):
+                    # tiles decoded in the loader threads are converted
+                    # here once, resampled only if not shown at their size
+                    if image.GetSize() != (size, size):
+                        image = image.Scale(size, size, quality)
+                    cached = (self.map_tiles[tile_key], size,
+                              wx.Bitmap(image), quality)
+                    self.tile_bitmaps[tile_key] = cached
+                dc.DrawBitmap(cached[2], screen_x, screen_y)
+            else:
+                dc.SetBrush(wx.Brush(
+                    colorset.get('COL_TILE_EMPTY')))
+                dc.SetPen(
+                    wx.Pen(
+                        colorset.get('COL_TILE_EDGE'), 1))
+                dc.DrawRectangle(screen_x, screen_y,
+                                 int(tile_size), int(tile_size))
+
+                if tile_key not in self.tiles_loading:
+                    wx.BeginBusyCursor()
+                    self.tiles_loading[tile_key] = (self.load_tile_async(
+                        self.map_provider, self.geo_zoom, tile_x, tile_y),
+                        False)
+
+        # prefetch a ring of tiles around the view
+        ring_x, ring_y = np.meshgrid(
+            np.arange(start_tile_x - 1, start_tile_x + tiles_x + 1),
+            np.arange(start_tile_y - 1, start_tile_y + tiles_y + 1))
+        border = ((ring_x < start_tile_x) |
+                  (ring_x >= start_tile_x + tiles_x) |
+                  (ring_y < start_tile_y) |
+                  (ring_y >= start_tile_y + tiles_y))
+        border &= ((ring_x >= 0) & (ring_x < max_tile) &
+                   (ring_y >= 0) & (ring_y < max_tile))
+        prefetch_keys = [(self.geo_zoom, tile_x, tile_y)
+                         for tile_x, tile_y in zip(ring_x[border].tolist(),
+                                                   ring_y[border].tolist())]
+        # and the tiles one level up, shown right away when zooming out
+        if self.geo_zoom > self.MIN_GEO_ZOOM:
+            prefetch_keys += sorted({(z - 1, x // 2, y // 2)
+                                     for z, x, y in visible})
+        # requests are served in order, after those of visible tiles
+        wanted = set(visible)
+        for tile_key in prefetch_keys:
+            wanted.add(tile_key)
+            if (tile_key not in self.map_tiles and
+                    tile_key not in self.tiles_loading):
+                self.tiles_loading[tile_key] = (self.load_tile_async(
+                    self.map_provider, *tile_key, prefetch=True), True)
+
+        # release bitmaps of tiles that went out of view
+        for tile_key in list(self.tile_bitmaps):
+            if tile_key not in visible:
+                del self.tile_bitmaps[tile_key]
+
+        # drop queued requests for tiles that went out of view
+        for tile_key, (future, prefetch) in list(self.tiles_loading.items()):
+            if tile_key not in wanted and future.cancel():
+                del self.tiles_loading[tile_key]
+                if not prefetch:
+                    wx.EndBusyCursor()
 
     def draw_grid(self, gc):
         """Draw background grid"""
@@ -1437,53 +1968,100 @@ class MapCanvas(wx.Panel):
         width, height = self.GetSize()
         grid_size = 50 * self.zoom_level
 
-        x = self.pan_x % grid_size
-        while x < width:
-            gc.StrokeLine(x, 0, x, height)
-            x += grid_size
-
-        y = self.pan_y % grid_size
-        while y < height:
-            gc.StrokeLine(0, y, width, y)
-            y += grid_size
+        key = (width, height, grid_size,
+               self.pan_x % grid_size, self.pan_y % grid_size)
+        if key != self._grid_lines_key:
+            self._grid_lines = (
+                np.arange(key[3], width, grid_size).tolist(),
+                np.arange(key[4], height, grid_size).tolist())
+            self._grid_lines_key = key
+        xs, ys = self._grid_lines
 
-    def draw_building(self, gc, building: Building):
-        """Draw a single building with rotation support"""
-        corners = building.get_corners()
-
-        # Create path for rotated rectangle
         path = gc.CreatePath()
-        path.MoveToPoint(*self.world_to_screen(*corners[0]))
-        for corner in corners[1:]:
-            path.AddLineToPoint(*self.world_to_screen(*corner))
-        path.CloseSubpath()
-
-        # Set colors based on selection
-        if building in self.selected_buildings:
-            fill_color = colorset.get('COL_SEL_BLDG_IN')
-            border_color = colorset.get('COL_SEL_BLDG_OUT')
+        for x in xs:
+            path.MoveToPoint(x, 0)
+            path.AddLineToPoint(x, height)
+        for y in ys:
+            path.MoveToPoint(0, y)
+            path.AddLineToPoint(width, y)
+        gc.StrokePath(path)
+
+    def _update_screen_outlines(self):
+        """Project building outlines and centers to the screen,
+        unless neither the buildings nor the view have changed"""
+        key = (self._geometry_version, self.zoom_level, self.pan_x, self.pan_y, tuple(self.GetSize()))
+        if key == self._screen_key:
+            return
+        corners = [b.get_corner_array() for b in self.buildings]
+        if corners:
+            # transform all corners and centers at once
+            xy = np.concatenate(corners)
+            counts = np.fromiter(map(len, corners), dtype=np.intp,
+                                 count=len(corners))
+            starts = np.cumsum(counts) - counts
+            centers = np.add.reduceat(xy, starts) / counts[:, None]
+            screen = self.world_to_screen_array(xy)
+            self._screen_boxes = np.hstack((
+                np.minimum.reduceat(screen, starts),
+                np.maximum.reduceat(screen, starts)))
+            points = screen.tolist()
+            self._screen_outlines = [
+                points[i:j] for i, j in zip(starts.tolist(),
+                                            (starts + counts).tolist())]
+            self._screen_centers = \
+                self.world_to_screen_array(centers).tolist()
         else:
-            fill_color = colorset.get('COL_BLDG_IN')
-            border_color = colorset.get('COL_BLDG_OUT')
+            self._screen_outlines = []
+            self._screen_centers = []
+            self._screen_boxes = np.empty((0, 4), dtype=np.float64)
+        self._screen_key = key
 
-        gc.SetBrush(wx.Brush(fill_color))
-        gc.SetPen(wx.Pen(border_color, 2))
-        gc.DrawPath(path)
+    def draw_buildings(self, gc):
+        """Draw all buildings, one path per selection state"""
+        self._update_screen_outlines()
 
-        # Draw height text at center
-        cx = sum(c[0] for c in corners) / len(corners)
-        cy = sum(c[1] for c in corners) / len(corners)
-        scx, scy = self.world_to_screen(cx, cy)
+        # skip buildings outside the window, with a margin for the border
+        width, height = self.GetSize()
+        left, top, right, bottom = self._screen_boxes.T
+        in_view = ((right >= -2) & (left <= width + 2) &
+                   (bottom >= -2) & (top <= height + 2))
+
+        selected = self.selected_buildings
+        paths = {False: gc.CreatePath(), True: gc.CreatePath()}
+        labels = []
+        for building, outline, center, visible in zip(
+                self.buildings, self._screen_outlines, self._screen_centers,
+                in_view.tolist()):
+            if not visible:
+                continue
+            # Add outline of rotated building
+            path = paths[building in selected]
+            path.MoveToPoint(*outline[0])
+            for point in outline[1:]:
+                path.AddLineToPoint(*point)
+            path.CloseSubpath()
 
-        gc.SetFont(wx.Font(10, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL,
-                           wx.FONTWEIGHT_NORMAL),
-                   colorset.get('COL_BLDG_LBL'))
-        if building.storeys:
-            text = f"{building.storeys}F"
-        else:
-            text = f"{round(building.height)}m"
-        tw, th = gc.GetTextExtent(text)
-        gc.DrawText(text, scx - tw / 2, scy - th / 2)
+            # Remember height text at center
+            if building.storeys:
+                text = f"{building.storeys}F"
+            else:
+                text = f"{round(building.height)}m"
+            labels.append((text, *center))
+
+        # Set colors based on selection
+        for is_selected, fill_key, border_key in (
+                (False, 'COL_BLDG_IN', 'COL_BLDG_OUT'),
+                (True, 'COL_SEL_BLDG_IN', 'COL_SEL_BLDG_OUT')):
+            gc.SetBrush(wx.Brush(colorset.get(fill_key)))
+            gc.SetPen(wx.Pen(colorset.get(border_key), 2))
+            # winding rule keeps overlapping buildings filled
+            gc.DrawPath(paths[is_selected], wx.WINDING_RULE)
+
+        # Draw height texts
+        gc.SetFont(self._label_font, colorset.get('COL_BLDG_LBL'))
+        for text, scx, scy in labels:
+            tw, th = gc.GetTextExtent(text)
+            gc.DrawText(text, scx - tw / 2, scy - th / 2)
 
     def draw_center_marker(self, gc):
         """
@@ -1603,7 +2181,6 @@ class MapCanvas(wx.Panel):
         """Draw preview of building being created with rotation support"""
         x1, y1 = self.floating_rect.anchor
         x2, y2 = self.screen_to_world(*self.current_mouse_pos)
-        dist = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
         angle = math.atan2(y2 - y1, x2 - x1)
 
         ctrl_pressed = wx.GetKeyState(wx.WXK_CONTROL)
@@ -1622,8 +2199,9 @@ class MapCanvas(wx.Panel):
                 dx = x2 - x1
                 dy = y2 - y1
                 new_r = self.floating_rect.r
-                new_a = + math.cos(new_r) * dx + math.sin(new_r) * dy
-                new_b = - math.sin(new_r) * dx + math.cos(new_r) * dy
+                cos_r, sin_r = math.cos(new_r), math.sin(new_r)
+                new_a = + cos_r * dx + sin_r * dy
+                new_b = - sin_r * dx + cos_r * dy
 
             if new_a <= 0 or new_b <= 0:
                 # do no accept negtaive values, do not draw
@@ -1640,7 +2218,7 @@ class MapCanvas(wx.Panel):
         elif mode == 'center':
             new_r = 0.
             new_a = 0.
-            new_b = math.sqrt((x2 - x1) ** 2 + (y2 - y1)**2)
+            new_b = math.hypot(x2 - x1, y2 - y1)
 
             corners = [
                 (-new_b, -new_b),
@@ -1657,9 +2235,10 @@ class MapCanvas(wx.Panel):
         # Draw rotated preview
         path = gc.CreatePath()
         path_start = True
+        cos_r, sin_r = math.cos(new_r), math.sin(new_r)
         for ca, cb in corners:
-            x = x1 + math.cos(new_r) * ca - math.sin(new_r) * cb
-            y = y1 + math.sin(new_r) * ca + math.cos(new_r) * cb
+            x = x1 + cos_r * ca - sin_r * cb
+            y = y1 + sin_r * ca + cos_r * cb
             sx, sy = self.world_to_screen(x, y)
             if path_start:
                 path.MoveToPoint(sx, sy)
@@ -1730,7 +2309,7 @@ class MapCanvas(wx.Panel):
             width, height = self.GetSize()
 
             # Get the bounds from the tile system (same as used for map tiles)
-            center_tile_x, center_tile_y = self.lat_lon_to_tile(
+            center_tile_x, center_tile_y = lat_lon_to_tile(
                 self.geo_center_lat, self.geo_center_lon, self.geo_zoom
             )
 
@@ -1747,9 +2326,9 @@ class MapCanvas(wx.Panel):
             se_tile_y = center_tile_y + (height - center_y) / tile_size
 
             # Convert tile coordinates to lat/lon
-            nw_lat, nw_lon = self.tile_to_lat_lon(nw_tile_x, nw_tile_y,
+            nw_lat, nw_lon = tile_to_lat_lon(nw_tile_x, nw_tile_y,
                                                   self.geo_zoom)
-            se_lat, se_lon = self.tile_to_lat_lon(se_tile_x, se_tile_y,
+            se_lat, se_lon = tile_to_lat_lon(se_tile_x, se_tile_y,
                                                   self.geo_zoom)
 
             # View bounds (west, south, east, north)
@@ -1790,10 +2369,10 @@ class MapCanvas(wx.Panel):
                     print("Drawing GeoTIFF image...")
 
                     # Convert intersection bounds to tile coordinates for screen positioning
-                    nw_tile_x_img, nw_tile_y_img = self.lat_lon_to_tile(
+                    nw_tile_x_img, nw_tile_y_img = lat_lon_to_tile(
                         intersect_bounds[3], intersect_bounds[0],
                         self.geo_zoom)  # north, west
-                    se_tile_x_img, se_tile_y_img = self.lat_lon_to_tile(
+                    se_tile_x_img, se_tile_y_img = lat_lon_to_tile(
                         intersect_bounds[1], intersect_bounds[2],
                         self.geo_zoom)  # south, east
 
@@ -1861,7 +2440,7 @@ class MapCanvas(wx.Panel):
         try:
             success = self.geotiff_layer.load_file(filepath)
             if success:
-                self.Refresh()
+                self.refresh_idle()
                 return True
         except Exception as e:
             wx.MessageBox(f"Failed to load GeoTIFF: {str(e)}", "Error",
@@ -1871,12 +2450,12 @@ class MapCanvas(wx.Panel):
     def set_geotiff_opacity(self, opacity):
         """Set GeoTIFF layer opacity (0.0 to 1.0)"""
         self.geotiff_layer.opacity = max(0.0, min(1.0, opacity))
-        self.Refresh()
+        self.refresh_idle()
 
     def toggle_geotiff_visibility(self):
         """Toggle GeoTIFF layer visibility"""
         self.geotiff_layer.visible = not self.geotiff_layer.visible
-        self.Refresh()
+        self.refresh_idle()
         return self.geotiff_layer.visible
 
     def on_mouse_down(self, event):
@@ -1912,12 +2491,13 @@ class MapCanvas(wx.Panel):
                 )
 
                 self.buildings.append(building)
+                self.buildings_changed()
                 self.floating_rect = None
                 self.mode = SelectMode.NORMAL
                 self._update_undo_menu_state()
                 self.statusbar.SetStatusText(
                     f"Added building #{len(self.buildings)}")
-                self.Refresh()
+                self.refresh_idle()
 
         elif self.mode == SelectMode.NORMAL:
             # Check for GeoJSON building click first
@@ -1929,13 +2509,15 @@ class MapCanvas(wx.Panel):
                     if geojson_building.contains_point(lat,
                                                        lon):  # Use lat, lon
                         geojson_building.selected = not geojson_building.selected
-                        self.Refresh()
+                        self.refresh_idle()
                         return
             if event.ShiftDown():
                 # shift-click on map: start spanning rectangle selection
                 self.mode = SelectMode.RECTANGLE_SELECT
                 self.selection_rect_start = event.GetPosition()
             else:
+                # snap_point relies on up-to-date arrays during the drag
+                self._update_building_arrays()
                 # check for corner drag
                 corner_idx = self.selected_buildings.get_corner_index(
                     wx, wy, 10 / self.zoom_level)
@@ -1956,11 +2538,7 @@ class MapCanvas(wx.Panel):
                         return
 
                 # Check for building click
-                clicked_building = None
-                for building in reversed(self.buildings):
-                    if building.contains_point(wx, wy):
-                        clicked_building = building
-                        break
+                clicked_building = self.building_at(wx, wy)
 
                 if clicked_building:
                     # a building was clicked
@@ -1989,7 +2567,7 @@ class MapCanvas(wx.Panel):
                     # unselect all
                     self.selected_buildings = BuildingGroup([])
 
-                self.Refresh()
+                self.refresh_idle()
 
     def on_mouse_up(self, event):
         """Handle mouse up events"""
@@ -2003,11 +2581,14 @@ class MapCanvas(wx.Panel):
             ry1, ry2 = min(y1, y2), max(y1, y2)
 
             # Select regular buildings
-            for building in self.buildings:
-                le, lo, ri, up = building.get_llur()
-                if (le >= rx1 and ri <= rx2 and
-                        lo >= ry1 and up <= ry2):
-                    self.selected_buildings.add(building)
+            self._update_building_arrays()
+            le, lo, ri, up = self._bx.T
+            inside = (le >= rx1) & (ri <= rx2) & (lo >= ry1) & (up <= ry2)
+            added = [self.buildings[i] for i in np.flatnonzero(inside)
+                     if self.buildings[i] not in self.selected_buildings]
+            if added:
+                self.selected_buildings = BuildingGroup(
+                    self.selected_buildings.buildings + added)
 
             # Select GeoJSON buildings if they are shown
             if self.geojson_mode == 'show':
@@ -2020,20 +2601,16 @@ class MapCanvas(wx.Panel):
                 geo_lon1, geo_lon2 = min(lon1, lon2), max(lon1, lon2)
                 
                 for geojson_building in self.geojson_buildings:
-                    # Check if all vertices are within the selection rectangle
-                    all_inside = True
-                    for lat, lon in geojson_building.coordinates:
-                        if not (geo_lat1 <= lat <= geo_lat2 and 
-                                geo_lon1 <= lon <= geo_lon2):
-                            all_inside = False
-                            break
-                    
-                    if all_inside:
+                    # all vertices are within the selection rectangle
+                    # if the bounding box is
+                    min_lat, min_lon, max_lat, max_lon = geojson_building.bbox
+                    if (geo_lat1 <= min_lat and max_lat <= geo_lat2 and
+                            geo_lon1 <= min_lon and max_lon <= geo_lon2):
                         geojson_building.selected = True
 
             self.mode = SelectMode.NORMAL
             self.selection_rect_start = None
-            self.Refresh()
+            self.refresh_idle()
 
         # Update undo menu state if we completed a drag operation
         if self._drag_state_saved:
@@ -2046,20 +2623,29 @@ class MapCanvas(wx.Panel):
 
     def on_mouse_motion(self, event):
         """Handle mouse motion events with rotation support"""
+        # nothing to do if neither the mouse nor the modifiers changed
+        motion = (event.GetPosition(), event.ControlDown(), event.ShiftDown())
+        if motion == self._last_motion:
+            return
+        self._last_motion = motion
+
         self.current_mouse_pos = event.GetPosition()
         wx, wy = self.screen_to_world(event.GetX(), event.GetY())
 
         if self.mouse_down and self.drag_start:
             # mouse id being dragged
-            snapped_x, snapped_y = self.snap_point(
-                wx, wy, exclude=self.selected_buildings)
+            if self.drag_mode in ['scale', 'rotate']:
+                snapped_x, snapped_y = self.snap_point(
+                    wx, wy, exclude=self.selected_buildings)
 
             if self.drag_mode == 'scale':
                 self.selected_buildings.scale_to_corner(
                     self.drag_corner_index, snapped_x, snapped_y)
+                self.buildings_changed()
             elif self.drag_mode == 'rotate':
                 self.selected_buildings.rotate_to_corner(
                     self.drag_corner_index, snapped_x, snapped_y)
+                self.buildings_changed()
             elif self.drag_mode == 'translate':
                 # Moving building
                 start_wx, start_wy = self.screen_to_world(*self.drag_start)
@@ -2075,6 +2661,7 @@ class MapCanvas(wx.Panel):
                 actual_dy = snapped_y - self.selected_buildings.y1
 
                 self.selected_buildings.shift(actual_dx, actual_dy)
+                self.buildings_changed()
                 self.drag_start = event.GetPosition()
             elif not event.ShiftDown():
                 # Panning
@@ -2083,19 +2670,24 @@ class MapCanvas(wx.Panel):
                 self.pan_x += dx
                 self.pan_y += dy
                 self.drag_start = event.GetPosition()
-            self.Refresh()
-
-        # Update preview
-        if (self.mode in [SelectMode.ADD_BUILDING, SelectMode.ADD_ROTUNDA]
-                and self.floating_rect):
-            self.Refresh()
-
-        if self.mode == SelectMode.RECTANGLE_SELECT:
-            self.Refresh()
+            if self.drag_mode is not None or not event.ShiftDown():
+                self.refresh_idle()
+
+        # Update preview or selection rectangle, repaint where
+        # it was and where it is now
+        overlay = self._get_overlay_rect()
+        if overlay is not None:
+            if self._overlay_rect is not None:
+                self.refresh_idle(overlay.Union(self._overlay_rect))
+            else:
+                self.refresh_idle(overlay)
+        self._overlay_rect = overlay
 
         # Update corner appearance when Ctrl is pressed/released
-        if len(self.selected_buildings) > 0:
-            self.Refresh()
+        if (len(self.selected_buildings) > 0
+                and event.ControlDown() != self._ctrl_down):
+            self._ctrl_down = event.ControlDown()
+            self.refresh_idle(self._get_handles_rect())
 
     def on_mouse_wheel(self, event):
         """Handle mouse wheel events for zooming"""
@@ -2107,13 +2699,87 @@ class MapCanvas(wx.Panel):
 
     def on_size(self, event):
         """Handle resize events"""
+        self._create_scene_bitmap()
         self.Refresh()
         event.Skip()
 
-    def set_building_stories(self, stories: int):
-        """Set stories for selected buildings"""
+    def _create_scene_bitmap(self):
+        """Allocate the scene bitmap for the window size,
+        in device pixels for sharp drawing on HiDPI screens"""
+        width, height = self.GetClientSize()
+        self._scene_bitmap = wx.Bitmap()
+        self._scene_bitmap.CreateWithDIPSize(
+            wx.Size(max(width, 1), max(height, 1)),
+            self.GetContentScaleFactor())
+        self._scene_dirty = True
+
+    def refresh_idle(self, rect: Optional[wx.Rect] = None):
+        """Request a repaint, merging all requests until the next frame.
+
+        If rect is given, only that part of the canvas is repainted
+        and only the overlays are drawn anew, otherwise the whole scene.
+        """
+        if rect is None:
+            self._scene_dirty = True
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self._dirty_rect = rect
+            # bursts of mouse events repaint at most once per frame
+            wait = (self._last_refresh + self.REFRESH_INTERVAL
+                    - time.monotonic())
+            if wait > 0:
+                wx.CallLater(math.ceil(wait * 1000), self._do_refresh)
+            else:
+                wx.CallAfter(self._do_refresh)
+        elif self._dirty_rect is not None:
+            self._dirty_rect = (None if rect is None
+                                else self._dirty_rect.Union(rect))
+
+    def _do_refresh(self):
+        self._refresh_pending = False
+        self._last_refresh = time.monotonic()
+        if self:  # canvas may have been destroyed meanwhile
+            # the paint handler clears the background itself
+            if self._dirty_rect is None:
+                self.Refresh(eraseBackground=False)
+            else:
+                self.RefreshRect(self._dirty_rect, eraseBackground=False)
+
+    def _get_overlay_rect(self) -> Optional[wx.Rect]:
+        """Screen area of the selection rectangle or building preview
+        that follows the mouse, None if there is none"""
+        mx, my = self.current_mouse_pos
+        if (self.mode == SelectMode.RECTANGLE_SELECT
+                and self.selection_rect_start):
+            sx, sy = self.selection_rect_start
+            rect = wx.Rect(min(sx, mx), min(sy, my),
+                           abs(mx - sx) + 1, abs(my - sy) + 1)
+        elif (self.mode in [SelectMode.ADD_BUILDING, SelectMode.ADD_ROTUNDA]
+                and self.floating_rect):
+            # the preview lies within a square around its anchor
+            ax, ay = self.world_to_screen(*self.floating_rect.anchor)
+            reach = max(math.hypot(mx - ax, my - ay),
+                        math.hypot(self.floating_rect.a,
+                                   self.floating_rect.b) * self.zoom_level)
+            reach = int(reach * math.sqrt(2)) + 1
+            rect = wx.Rect(int(ax) - reach, int(ay) - reach,
+                           2 * reach + 1, 2 * reach + 1)
+        else:
+            return None
+        return rect.Inflate(4, 4)  # pen width
+
+    def _get_handles_rect(self) -> wx.Rect:
+        """Screen area of the selection corner handles"""
+        xy = self.world_to_screen_array(
+            np.asarray(self.selected_buildings.get_corners(), dtype=float))
+        x0, y0 = np.floor(xy.min(axis=0)).astype(int).tolist()
+        x1, y1 = np.ceil(xy.max(axis=0)).astype(int).tolist()
+        return wx.Rect(x0, y0, x1 - x0 + 1, y1 - y0 + 1).Inflate(6, 6)
+
+    def set_building_stories(self, stories: int) -> int:
+        """Set stories for selected buildings, return how many changed"""
         if not self.selected_buildings.buildings:
-            return
+            return 0
         
         # Save state before changing height
         self.undo_manager.save_state(
@@ -2124,13 +2790,25 @@ class MapCanvas(wx.Panel):
         for building in self.selected_buildings:
             building.storeys = stories
             building.height = stories * self.storey_height
-        self.Refresh()
+        self.refresh_idle()
         self._update_undo_menu_state()
-
-    def delete_selected_buildings(self):
-        """Delete selected buildings"""
+        return len(self.selected_buildings.buildings)
+
+    def set_storey_height(self, storey_height: float):
+        """Set the height per storey and update the heights
+        of all buildings that are defined by their storeys"""
+        self.storey_height = storey_height
+        storeys = np.fromiter((b.storeys for b in self.buildings),
+                              dtype=np.int64, count=len(self.buildings))
+        heights = (storeys * storey_height).tolist()
+        # Update only buildings using storeys
+        for i in np.flatnonzero(storeys).tolist():
+            self.buildings[i].height = heights[i]
+
+    def delete_selected_buildings(self) -> int:
+        """Delete selected buildings, return how many were deleted"""
         if not self.selected_buildings.buildings:
-            return
+            return 0
         
         # Save state before deletion
         count = len(self.selected_buildings.buildings)
@@ -2139,11 +2817,13 @@ class MapCanvas(wx.Panel):
             f"Delete {count} building(s)"
         )
         
-        for b in self.selected_buildings.buildings.copy():
-            self.selected_buildings.remove(b)
-            self.buildings = [x for x in self.buildings if x != b]
-        self.Refresh()
+        selected = self.selected_buildings
+        self.buildings = [b for b in self.buildings if b not in selected]
+        self.buildings_changed()
+        self.selected_buildings = BuildingGroup([])
+        self.refresh_idle()
         self._update_undo_menu_state()
+        return count
 
     def undo(self) -> bool:
         """
@@ -2157,8 +2837,9 @@ class MapCanvas(wx.Panel):
         previous_buildings = self.undo_manager.undo(self.buildings)
         if previous_buildings is not None:
             self.buildings = previous_buildings
+            self.buildings_changed()
             self.selected_buildings = BuildingGroup([])
-            self.Refresh()
+            self.refresh_idle()
             self._update_undo_menu_state()
             return True
         return False
@@ -2175,8 +2856,9 @@ class MapCanvas(wx.Panel):
         next_buildings = self.undo_manager.redo(self.buildings)
         if next_buildings is not None:
             self.buildings = next_buildings
+            self.buildings_changed()
             self.selected_buildings = BuildingGroup([])
-            self.Refresh()
+            self.refresh_idle()
             self._update_undo_menu_state()
             return True
         return False
@@ -2214,17 +2896,23 @@ class MapCanvas(wx.Panel):
         self.pan_x += apex_x - new_mx
         self.pan_y += apex_y - new_my
 
-        self.Refresh()
+        self._zooming = True
+        self._zoom_settle.StartOnce(250)
+        self.refresh_idle()
+
+    def on_zoom_settled(self, event):
+        """Redraw the map tiles in full quality once zooming stopped"""
+        self._zooming = False
+        self.refresh_idle()
 
     def zoom_to_buildings(self):
         """Zoom to fit all buildings"""
         if not self.buildings:
             return
 
-        xw_min = min(b.get_llur()[0] for b in self.buildings)
-        yw_min = min(b.get_llur()[1] for b in self.buildings)
-        xw_max = max(b.get_llur()[2] for b in self.buildings)
-        yw_max = max(b.get_llur()[3] for b in self.buildings)
+        self._update_building_arrays()
+        xw_min, yw_min = self._bx[:, :2].min(axis=0).tolist()
+        xw_max, yw_max = self._bx[:, 2:].max(axis=0).tolist()
 
         width, height = self.GetSize()
         margin = 50
@@ -2252,7 +2940,7 @@ class MapCanvas(wx.Panel):
         self.pan_x += dxs
         self.pan_y += dys
 
-        self.Refresh()
+        self.refresh_idle()
 
 # =========================================================================
 
@@ -2315,6 +3003,10 @@ class ImportProgressDialog(wx.Dialog):
 class MainFrame(wx.Frame):
     """Main application frame"""
 
+    # key codes of the number keys that set building stories
+    _DIGIT_MIN = ord('1')
+    _DIGIT_MAX = ord('9')
+
     def __init__(self):
         super().__init__(None, title=f"{APP_NAME} {APP_VERSION}",
                          size=(1200, 800))
@@ -2330,6 +3022,7 @@ class MainFrame(wx.Frame):
 
         # Bind keyboard events
         self.Bind(wx.EVT_CHAR_HOOK, self.on_key_press)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
 
         self.Centre()
         self.Show()
@@ -2559,11 +3252,11 @@ class MainFrame(wx.Frame):
         key = event.GetKeyCode()
 
         # Number keys 1-9 for setting building stories
-        if ord('1') <= key <= ord('9'):
+        if self._DIGIT_MIN <= key <= self._DIGIT_MAX:
             stories = key - ord('0')
-            self.canvas.set_building_stories(stories)
-            self.SetStatusText(
-                f"Set selected buildings to {stories} stories")
+            if self.canvas.set_building_stories(stories):
+                self.SetStatusText(
+                    f"Set selected buildings to {stories} stories")
         # Undo/Redo
         elif event.ControlDown() and key == ord('Z'):
             self.on_undo(None)
@@ -2627,11 +3320,12 @@ class MainFrame(wx.Frame):
                               self.canvas.storey_height)
         if dialog.ShowModal() == wx.ID_OK:
             new_stories, new_height = dialog.get_values()
-            for building in self.canvas.selected_buildings:
-                if new_stories is not None:
-                    building.storeys = new_stories
-                building.height = new_height
-            self.canvas.Refresh()
+            with wx.WindowUpdateLocker(self.canvas):
+                for building in self.canvas.selected_buildings:
+                    if new_stories is not None:
+                        building.storeys = new_stories
+                    building.height = new_height
+            self.canvas.refresh_idle()
             if new_stories is not None:
                 self.SetStatusText(
                     f"Set height to {new_stories} stories ({new_height:.1f}m)")
@@ -2700,9 +3394,8 @@ class MainFrame(wx.Frame):
         )
 
         if result == wx.YES:
-            self.canvas.delete_selected_buildings()
-            self.SetStatusText(f"Deleted "
-            f"{len(self.canvas.selected_buildings)} building(s).")
+            count = self.canvas.delete_selected_buildings()
+            self.SetStatusText(f"Deleted {count} building(s).")
 
     def on_zoom_in(self, event):
         """Zoom in"""
@@ -2737,10 +3430,9 @@ class MainFrame(wx.Frame):
             self.canvas.show_center_marker = show_marker
 
             # Clear tile cache since center changed
-            self.canvas.map_tiles.clear()
-            self.canvas.tiles_loading.clear()
+            self.canvas.clear_tiles()
 
-            self.canvas.Refresh()
+            self.canvas.refresh_idle()
 
             self.SetStatusText(
                 f"Center: {lat:.4f}, {lon:.4f}"
@@ -2759,15 +3451,11 @@ class MainFrame(wx.Frame):
         if dialog.ShowModal() == wx.ID_OK:
             provider = dialog.get_values()
 
-            # Clear tile cache if provider changed
+            # Clear tile cache and redraw only if provider changed
             if provider != self.canvas.map_provider:
-                self.canvas.map_tiles.clear()
-                self.canvas.tiles_loading.clear()
-
-            # Update canvas settings
-            self.canvas.map_provider = provider
-
-            self.canvas.Refresh()
+                self.canvas.clear_tiles()
+                self.canvas.map_provider = provider
+                self.canvas.refresh_idle()
 
             if provider != MapProvider.NONE:
                 self.SetStatusText(f"Basemap: {provider.value}")
@@ -2789,13 +3477,9 @@ class MainFrame(wx.Frame):
             try:
                 height = float(dialog.GetValue())
                 if height > 0:
-                    self.canvas.storey_height = height
-                    # Update all buildings
-                    for building in self.canvas.buildings:
-                        # Update only buildings using stroreys
-                        if building.storeys:
-                            building.height = building.storeys * height
-                    self.canvas.Refresh()
+                    with wx.WindowUpdateLocker(self.canvas):
+                        self.canvas.set_storey_height(height)
+                    self.canvas.refresh_idle()
                     self.SetStatusText(
                         f"Storey height set to {height:.1f}m")
                 else:
@@ -2809,15 +3493,19 @@ class MainFrame(wx.Frame):
 
     def on_settings(self, event):
         """Open settings dialog"""
+        circle_corners = settings.get('CIRCLE_CORNERS')
         dialog = ColorSettingsDialog(self, colorset)
         dialog.ShowModal()
         dialog.Destroy()
 
+        if settings.get('CIRCLE_CORNERS') != circle_corners:
+            self.canvas.circle_corners_changed()
+
         # Update GBA menu state in case directory was changed
         self._update_gba_menu_state()
         
         # Refresh the canvas to show color changes
-        self.canvas.Refresh()
+        self.canvas.refresh_idle()
 
 
     def on_show_3d_view(self, event):
@@ -2854,8 +3542,10 @@ class MainFrame(wx.Frame):
             elif result == wx.CANCEL:
                 return
 
-        self.canvas.buildings.clear()
-        self.canvas.Refresh()
+        with wx.WindowUpdateLocker(self.canvas):
+            self.canvas.buildings.clear()
+        self.canvas.buildings_changed()
+        self.canvas.refresh_idle()
         self.current_file = None
         self.modified = False
         self.SetTitle(f"{APP_NAME} - New Project")
@@ -3166,10 +3856,11 @@ class MainFrame(wx.Frame):
             # Load Buildings
             buildings_data = data.get('buildings', [])
             if buildings_data:
-                batts = Building.__annotations__
+                batts = [f for f in fields(Building) if f.init]
                 for bldg in buildings_data:
-                    bs = [v(bldg[k]) for k,v in batts.items()]
+                    bs = [f.type(bldg[f.name]) for f in batts]
                     self.canvas.buildings.append(Building(*bs))
+            self.canvas.buildings_changed()
 
             # Load editor settings
             editor_settings = data.get('editor_settings', {})
@@ -3191,7 +3882,7 @@ class MainFrame(wx.Frame):
                     'storey_height', 3.3))
 
                 # Clear map tiles to reload with new settings
-                self.canvas.map_tiles.clear()
+                self.canvas.clear_tiles()
 
             color_settings = data.get('color_settings', None)
             if color_settings:
@@ -3224,8 +3915,9 @@ class MainFrame(wx.Frame):
             buildings_data = []
             for bldg in self.canvas.buildings:
                 batt = {}
-                for att in list(bldg.__dict__.keys()):
-                    batt[att] = str(bldg.__getattribute__(att))
+                for f in fields(bldg):
+                    if f.init:
+                        batt[f.name] = str(getattr(bldg, f.name))
                 buildings_data.append(batt)
             data['buildings'] = buildings_data
 
@@ -3268,6 +3960,7 @@ class MainFrame(wx.Frame):
             self.canvas.geo_center_lon = lon
             self.canvas.buildings.clear()
             self.canvas.buildings = buildings
+            self.canvas.buildings_changed()
             self.modified = False
             self.SetTitle(f"{APP_NAME} - {filepath}")
             self.canvas.zoom_to_buildings()
@@ -3354,83 +4047,171 @@ class MainFrame(wx.Frame):
 
         dialog.Destroy()
 
+    @staticmethod
+    def _read_cityjson(filepath):
+        """
+        Read a CityJSON file.
+
+        Files larger than STREAM_THRESHOLD are streamed with ijson,
+        if available, in a single pass over the top-level keys in any
+        order: the vertices go straight into an array and the city
+        objects are parsed one by one, so neither the file contents nor
+        the vertex coordinates as Python floats are held in memory.
+        Smaller files are parsed at once, fastest by orjson.
+
+        :return: file type, metadata, vertices as (n, 3) array
+            and an iterable of (object id, object data) pairs
+        """
+        if not (IJSON_SUPPORT and
+                os.path.getsize(filepath) > STREAM_THRESHOLD):
+            with open(filepath, 'rb') as f:
+                if ORJSON_SUPPORT:
+                    data = orjson.loads(f.read())
+                else:
+                    data = json.load(f)
+            vertices = np.asarray(data.get('vertices', []),
+                                  dtype=np.float64).reshape(-1, 3)
+            return (data.get('type'), data.get('metadata', {}), vertices,
+                    data.get('CityObjects', {}).items())
+
+        def build(event, value):
+            """Build the value that starts with the current event"""
+            builder = ijson.ObjectBuilder()
+            depth = 0
+            while True:
+                builder.event(event, value)
+                if event in ('start_map', 'start_array'):
+                    depth += 1
+                elif event in ('end_map', 'end_array'):
+                    depth -= 1
+                if depth == 0:
+                    return builder.value
+                _, event, value = next(events)
+
+        def until_end(prefix, end):
+            """Take the events up to the end of the value at prefix"""
+            for item in events:
+                if item[0] == prefix and item[1] == end:
+                    return
+                yield item
+
+        file_type, metadata = None, {}
+        vertices = np.empty((0, 3), dtype=np.float64)
+        city_objects = []
+        with open(filepath, 'rb') as f:
+            events = ijson.parse(f, use_float=True)
+            for prefix, event, key in events:
+                if prefix or event != 'map_key':
+                    continue
+                _, event, value = next(events)
+                if key == 'vertices':
+                    vertices = np.fromiter(
+                        (value for _, event, value in
+                         until_end('vertices', 'end_array')
+                         if event == 'number'),
+                        dtype=np.float64).reshape(-1, 3)
+                elif key == 'CityObjects':
+                    for _, _, obj_id in until_end('CityObjects', 'end_map'):
+                        _, event, value = next(events)
+                        city_objects.append((obj_id, build(event, value)))
+                else:
+                    value = build(event, value)
+                    if key == 'type':
+                        file_type = value
+                    elif key == 'metadata':
+                        metadata = value
+
+        return file_type, metadata, vertices, city_objects
+
     def load_cityjson(self, filepath):
         """Load a CityJSON file"""
         try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            file_type, metadata, vertices, city_objects = \
+                self._read_cityjson(filepath)
 
-            if data.get('type') != 'CityJSON':
+            if file_type != 'CityJSON':
                 wx.MessageBox("Not a valid CityJSON file", "Error",
                               wx.OK | wx.ICON_ERROR)
                 return
 
-            # Clear current buildings
-            self.canvas.buildings.clear()
-
-            # Load metadata if available
-            metadata = data.get('metadata', {})
-            editor_settings = metadata.get('cityjson_editor_settings',
-                                            {})
-            if editor_settings:
-                # Restore map settings
-                map_provider_str = editor_settings.get('map_provider',
-                                                        'None')
-                for provider in MapProvider:
-                    if provider.value == map_provider_str:
-                        self.canvas.map_provider = provider
-                        break
-
-                self.canvas.geo_center_lat = editor_settings.get(
-                    'geo_center_lat', 49.4875)
-                self.canvas.geo_center_lon = editor_settings.get(
-                    'geo_center_lon', 8.4660)
-                self.canvas.geo_zoom = editor_settings.get('geo_zoom', 16)
-                self.canvas.storey_height = editor_settings.get(
-                    'storey_height', 3.3)
-
-                # Clear map tiles to reload with new settings
-                self.canvas.map_tiles.clear()
-
-            # Load vertices
-            vertices = data.get('vertices', [])
+            with wx.WindowUpdateLocker(self.canvas):
+                # Clear current buildings
+                self.canvas.buildings.clear()
+
+                # Load metadata if available
+                editor_settings = metadata.get('cityjson_editor_settings',
+                                                {})
+                if editor_settings:
+                    # Restore map settings
+                    map_provider_str = editor_settings.get('map_provider',
+                                                            'None')
+                    for provider in MapProvider:
+                        if provider.value == map_provider_str:
+                            self.canvas.map_provider = provider
+                            break
 
-            # Load city objects
-            for obj_id, obj_data in data.get('CityObjects', {}).items():
-                if obj_data.get('type') == 'Building':
+                    self.canvas.geo_center_lat = editor_settings.get(
+                        'geo_center_lat', 49.4875)
+                    self.canvas.geo_center_lon = editor_settings.get(
+                        'geo_center_lon', 8.4660)
+                    self.canvas.geo_zoom = editor_settings.get('geo_zoom', 16)
+                    self.canvas.storey_height = editor_settings.get(
+                        'storey_height', 3.3)
+
+                    # Clear map tiles to reload with new settings
+                    self.canvas.clear_tiles()
+
+                # Load city objects
+                records = []  # id, bottom face, height, stories
+                for obj_id, obj_data in city_objects:
+                    if obj_data.get('type') != 'Building':
+                        continue
                     # Extract building geometry
-                    geom = obj_data.get('geometry', [])
-                    if geom and geom[0].get('type') == 'Solid':
-                        boundaries = geom[0].get('boundaries', [])
-                        if boundaries:
-                            # Get vertices of the bottom face
-                            bottom_face = boundaries[0][
-                                0] if boundaries else []
-                            if len(bottom_face) >= 4:
-                                # Get building bounds
-                                v_indices = bottom_face
-                                xs = [vertices[i][0] for i in v_indices]
-                                ys = [vertices[i][1] for i in v_indices]
-                                zs = [vertices[i][2] for i in v_indices]
-
-                                # Get attributes
-                                attrs = obj_data.get('attributes', {})
-                                height = attrs.get('height', max(zs) - min(
-                                    zs) if zs else 10.0)
-                                stories = attrs.get('stories', max(1,
-                                                                   round(
-                                                                       height / self.canvas.storey_height)))
-
-                                building = Building(
-                                    id=obj_id,
-                                    x1=min(xs),
-                                    y1=min(ys),
-                                    x2=max(xs),
-                                    y2=max(ys),
-                                    height=height,
-                                    storeys=stories
-                                )
-                                self.canvas.buildings.append(building)
+                    geom = obj_data.get('geometry')
+                    if not geom or geom[0].get('type') != 'Solid':
+                        continue
+                    boundaries = geom[0].get('boundaries')
+                    if not boundaries:
+                        continue
+                    # outer shell -> bottom surface -> outer ring
+                    bottom_face = boundaries[0][0][0]
+                    if len(bottom_face) < 4:
+                        continue
+
+                    # Get attributes
+                    attrs = obj_data.get('attributes', {})
+                    height = attrs.get('height')
+                    if height is None:
+                        # vertical extent of the whole solid
+                        shell = np.fromiter(
+                            (i for surface in boundaries[0]
+                             for i in surface[0]), dtype=np.intp)
+                        zs = vertices[shell, 2]
+                        height = float(zs.max() - zs.min())
+                    stories = attrs.get('stories', max(1, round(
+                        height / self.canvas.storey_height)))
+
+                    records.append((obj_id, bottom_face, height, stories))
+
+                # blocks are built together, in the order of the file
+                buildings = [None] * len(records)
+                rows = [i for i, r in enumerate(records) if len(r[1]) == 4]
+                if rows:
+                    ids, faces, heights, storeys = zip(
+                        *(records[i] for i in rows))
+                    blocks = Building.blocks_from_corners(
+                        ids, vertices[np.array(faces, dtype=np.intp)],
+                        heights, storeys)
+                    for i, building in zip(rows, blocks):
+                        buildings[i] = building
+                for i, (obj_id, bottom_face, height, stories) in \
+                        enumerate(records):
+                    if buildings[i] is None:
+                        buildings[i] = Building.from_corners(
+                            obj_id, vertices[bottom_face],
+                            height=height, storeys=stories)
+                self.canvas.buildings.extend(buildings)
+            self.canvas.buildings_changed()
 
             self.current_file = filepath
             self.modified = False
@@ -3446,65 +4227,51 @@ class MainFrame(wx.Frame):
     def save_cityjson(self, filepath):
         """Save to a CityJSON file"""
         try:
-            # Collect all vertices and create index mapping
-            all_vertices = []
-            vertex_map = {}
-
-            city_objects = {}
-
-            for building in self.canvas.buildings:
-                vertices, boundaries = building.to_cityjson_geometry()
-
-                # Map vertices to global index
-                local_to_global = []
-                for v in vertices:
-                    v_tuple = tuple(v)
-                    if v_tuple not in vertex_map:
-                        vertex_map[v_tuple] = len(all_vertices)
-                        all_vertices.append(list(v))
-                    local_to_global.append(vertex_map[v_tuple])
-
-                # Remap boundaries to global indices
-                remapped_boundaries = []
-                for face in boundaries:
-                    remapped_face = [[local_to_global[i] for i in ring] for
-                                     ring in face]
-                    remapped_boundaries.append(remapped_face)
-
-                # Create city object
-                city_objects[building.id] = {
-                    "type": "Building",
-                    "attributes": {
-                        "height": building.height,
-                        "stories": building.storeys
-                    },
-                    "geometry": [{
-                        "type": "Solid",
-                        "lod": 1,
-                        "boundaries": [remapped_boundaries]
-                    }]
-                }
+            vertices, boundaries = \
+                self.canvas.export_vertices_boundaries()
+
+            # Merge shared vertices and create index mapping
+            all_vertices, to_global = merge_vertices(vertices)
+            # orjson encodes the array directly, json needs lists
+            if not ORJSON_SUPPORT:
+                all_vertices = all_vertices.tolist()
+
+            # min x, y, z and max x, y, z in one pass each
+            if len(vertices):
+                extent = (vertices.min(axis=0).tolist() +
+                          vertices.max(axis=0).tolist())
+            else:
+                extent = [0] * 6
+
+            def city_objects():
+                global_index = to_global.__getitem__
+                for building, faces in zip(self.canvas.buildings,
+                                           boundaries):
+                    # Remap boundaries to global indices
+                    remapped_boundaries = [[list(map(global_index, face))]
+                                           for face in faces]
+
+                    # Create city object
+                    yield building.id, {
+                        "type": "Building",
+                        "attributes": {
+                            "height": building.height,
+                            "stories": building.storeys
+                        },
+                        "geometry": [{
+                            "type": "Solid",
+                            "lod": 1,
+                            "boundaries": [remapped_boundaries]
+                        }]
+                    }
 
             # Create CityJSON structure with metadata
             cityjson = {
                 "type": "CityJSON",
                 "version": "1.1",
                 "metadata": {
-                    "geographicalExtent": [
-                        min(v[0] for v in
-                            all_vertices) if all_vertices else 0,
-                        min(v[1] for v in
-                            all_vertices) if all_vertices else 0,
-                        min(v[2] for v in
-                            all_vertices) if all_vertices else 0,
-                        max(v[0] for v in
-                            all_vertices) if all_vertices else 0,
-                        max(v[1] for v in
-                            all_vertices) if all_vertices else 0,
-                        max(v[2] for v in
-                            all_vertices) if all_vertices else 0,
-                    ],
-                    "referenceSystem": f"https://www.opengis.net/def/crs/EPSG/0/4326",
+                    "geographicalExtent": extent,
+                    "referenceSystem": CITYJSON_CRS,
                     "cityjson_editor_settings": {
                         "map_provider": self.canvas.map_provider.value,
                         "geo_center_lat": self.canvas.geo_center_lat,
@@ -3512,14 +4279,32 @@ class MainFrame(wx.Frame):
                         "geo_zoom": self.canvas.geo_zoom,
                         "storey_height": self.canvas.storey_height
                     }
-                },
-                "CityObjects": city_objects,
-                "vertices": all_vertices
+                }
             }
 
-            # Save to file
-            with open(filepath, 'w') as f:
-                json.dump(cityjson, f, indent=2)
+            # Save to file, compact to stay on the fast C encoders,
+            # both write in many small chunks, so buffer generously
+            if ORJSON_SUPPORT:
+                # stream the city objects one by one, so the document
+                # is never held in memory as a whole
+                with open(filepath, 'wb', buffering=SAVE_BUFFER_SIZE) as f:
+                    f.write(orjson.dumps(cityjson)[:-1])
+                    f.write(b',"CityObjects":{')
+                    for i, (obj_id, obj) in enumerate(city_objects()):
+                        if i:
+                            f.write(b',')
+                        f.write(orjson.dumps(obj_id))
+                        f.write(b':')
+                        f.write(orjson.dumps(obj))
+                    f.write(b'},"vertices":')
+                    f.write(orjson.dumps(
+                        all_vertices, option=orjson.OPT_SERIALIZE_NUMPY))
+                    f.write(b'}')
+            else:
+                cityjson["CityObjects"] = dict(city_objects())
+                cityjson["vertices"] = all_vertices
+                with open(filepath, 'w', buffering=SAVE_BUFFER_SIZE) as f:
+                    json.dump(cityjson, f, separators=(',', ':'))
 
             self.current_file = filepath
             self.modified = False
@@ -3627,6 +4412,12 @@ class MainFrame(wx.Frame):
 
         self.Close()
 
+    def on_close(self, event):
+        """Drop queued tile downloads and stop the download workers"""
+        self.canvas.clear_tiles()
+        self.canvas.tile_loader.shutdown()
+        event.Skip()
+
     def on_about(self, event):
         about = (AboutDialog(self))
         about.ShowModal()
@@ -1,13 +1,28 @@
+from functools import lru_cache
 import math
 import statistics
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List, Tuple
 
-from .AppSettings import settings
+import numpy as np
+
+# attributes that define the footprint of a building
+_GEOMETRY_ATTRS = frozenset(('x1', 'y1', 'a', 'b', 'rotation'))
+
+# faces of a block building as indices into its vertices
+# (0-3: bottom corners, 4-7: top corners)
+BLOCK_FACES = np.array([
+    [0, 1, 2, 3],  # bottom
+    [4, 7, 6, 5],  # top
+    [0, 4, 5, 1],  # front
+    [2, 6, 7, 3],  # back
+    [0, 3, 7, 4],  # left
+    [1, 5, 6, 2],  # right
+], dtype=np.int32)
 
 # =========================================================================
 
-@dataclass
+@dataclass(slots=True)
 class Building:
     """
     Represents a building with its geometric properties.
@@ -36,6 +51,66 @@ class Building:
     storeys: int = 3
     # selected: bool = False
     rotation: float = 0.0  # rotation angle in radians (math definition)
+    # cached corners, cleared whenever the footprint changes
+    _corners: Optional[List[Tuple[float, float]]] = field(
+        default=None, init=False, repr=False, compare=False)
+    _corner_array: Optional[np.ndarray] = field(
+        default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, attr, value):
+        object.__setattr__(self, attr, value)
+        if attr in _GEOMETRY_ATTRS:
+            self.reset_corners()
+
+    def reset_corners(self):
+        """Forget the cached corners, e.g. after the number of corners
+        of cylindrical buildings was changed in the settings"""
+        object.__setattr__(self, '_corners', None)
+        object.__setattr__(self, '_corner_array', None)
+
+    @classmethod
+    def from_corners(cls, id: str, corners, height: float = 10.0,
+                     storeys: int = 3) -> 'Building':
+        """Create a building from its footprint corners
+        (4 for a block, more for a cylinder, as from get_corners)"""
+        corners = np.asarray(corners, dtype=np.float64)[:, :2]
+        if len(corners) == 4:
+            da = corners[1] - corners[0]
+            db = corners[3] - corners[0]
+            return cls(id=id,
+                       x1=float(corners[0, 0]), y1=float(corners[0, 1]),
+                       a=float(np.hypot(*da)), b=float(np.hypot(*db)),
+                       height=height, storeys=storeys,
+                       rotation=float(np.arctan2(da[1], da[0])))
+        center = corners.mean(axis=0)
+        radius = np.hypot(*(corners - center).T)
+        if np.ptp(radius) <= 1.e-6 * max(float(radius.max()), 1.):
+            return cls(id=id, x1=float(center[0]), y1=float(center[1]),
+                       a=0., b=float(radius.mean()),
+                       height=height, storeys=storeys)
+        # any other polygon: surrounding rectangle
+        (le, lo), (ri, up) = corners.min(axis=0), corners.max(axis=0)
+        return cls(id=id, x1=float(le), y1=float(lo),
+                   a=float(ri - le), b=float(up - lo),
+                   height=height, storeys=storeys)
+
+    @classmethod
+    def blocks_from_corners(cls, ids: List[str], corners,
+                            heights: List[float], storeys: List[int]
+                            ) -> List['Building']:
+        """Create block buildings from the (n, 4, 2+) array of their
+        footprint corners in one pass, like from_corners does for one"""
+        corners = np.asarray(corners, dtype=np.float64)[:, :, :2]
+        da = corners[:, 1] - corners[:, 0]
+        db = corners[:, 3] - corners[:, 0]
+        return [cls(id=id, x1=x1, y1=y1, a=a, b=b, height=height,
+                    storeys=n, rotation=rotation)
+                for id, x1, y1, a, b, rotation, height, n in zip(
+                    ids, corners[:, 0, 0].tolist(), corners[:, 0, 1].tolist(),
+                    np.hypot(da[:, 0], da[:, 1]).tolist(),
+                    np.hypot(db[:, 0], db[:, 1]).tolist(),
+                    np.arctan2(da[:, 1], da[:, 0]).tolist(),
+                    heights, storeys)]
 
     def contains_point(self, x: float, y: float) -> bool:
         """Check if a point is inside the building (considering rotation)"""
@@ -57,34 +132,57 @@ class Building:
                          threshold: float = 10) -> Optional[int]:
         """Get which corner is near the point (0-3), None if no corner"""
         corners = self.get_corners()
+        t2 = threshold * threshold
         for i, (cx, cy) in enumerate(corners):
-            if math.sqrt((x - cx) ** 2 + (y - cy) ** 2) < threshold:
+            dx = x - cx
+            dy = y - cy
+            if dx * dx + dy * dy < t2:
                 return i
         return None
 
     def get_corners(self) -> List[Tuple[float, float]]:
-        """Get all four corners after rotation"""
+        """Get all corners after rotation (cached, do not modify)"""
+        corners = self._corners
+        if corners is not None:
+            return corners
+
         if self.a <= 0:
             # cylidrical building
+            # (settings imported here, block geometry does not need wx)
+            from .AppSettings import settings
             nc = settings.get('CIRCLE_CORNERS') + 1
             dr = 2 * math.pi / nc
-            corners = [
+            local = [
                 (self.b * math.cos(i * dr),
                  self.b * math.sin(i * dr)) for i in range(nc)
             ]
         else:
             # block building
-            corners = [
+            local = [
                 (0., 0.),  # 0: bottom-left
                 (self.a, 0.),  # 1: bottom-right
                 (self.a, self.b),  # 2: top-right
                 (0., self.b),  # 3: top-left
             ]
 
-        rotated = []
-        for px, py in corners:
-            rotated.append(self.building_to_world(px, py))
-        return rotated
+        cos_r = math.cos(self.rotation)
+        sin_r = math.sin(self.rotation)
+        corners = [(cos_r * px - sin_r * py + self.x1,
+                    sin_r * px + cos_r * py + self.y1)
+                   for px, py in local]
+        self._corners = corners
+        self._corner_array = None
+        return corners
+
+    def get_corner_array(self) -> np.ndarray:
+        """Get all corners after rotation as read-only (n, 2) array"""
+        corners = self.get_corners()
+        array = self._corner_array
+        if array is None:
+            array = np.array(corners, dtype=np.float64)
+            array.flags.writeable = False
+            self._corner_array = array
+        return array
 
     def get_llur(self) -> Tuple[float, float,float, float]:
         """Get lower left and upper right of surrounding rectangle"""
@@ -119,14 +217,13 @@ class Building:
         """Rotate the building so that the specified corner moves to target point"""
         old_x, old_y = self.get_corners()[corner_index]
         old_angle = math.atan2(old_y - self.y1, old_x - self.x1)
-        old_dist = math.sqrt((old_x - self.x1) ** 2 +
-                             (old_y - self.y1) ** 2)
+        old_dist2 = (old_x - self.x1) ** 2 + (old_y - self.y1) ** 2
         new_angle = math.atan2(new_y - self.y1, new_x - self.x1)
-        new_dist = math.sqrt((new_x - self.x1) ** 2 +
-                             (new_y - self.y1) ** 2)
+        new_dist2 = (new_x - self.x1) ** 2 + (new_y - self.y1) ** 2
+        scale = math.sqrt(new_dist2 / old_dist2)
         self.rotation += new_angle - old_angle
-        self.a *= new_dist / old_dist
-        self.b *= new_dist / old_dist
+        self.a *= scale
+        self.b *= scale
 
     def scale_to_corner(self, corner_index: int, new_x: float,
                         new_y: float):
@@ -154,32 +251,6 @@ class Building:
         """Move the entire building by incremental distance"""
         self.translate(self.x1 + dx, self.y1 + dy)
 
-    def to_cityjson_geometry(self) -> dict:
-        """Convert to CityJSON geometry format"""
-        # # Get rotated corners for the base
-        # rotated_corners = self.get_corners()
-        #
-        # # Create vertices for the building (8 points for a box)
-        # vertices = []
-        # # Bottom face
-        # for cx, cy in rotated_corners:
-        #     vertices.append([cx, cy, 0.0])
-        # # Top face
-        # for cx, cy in rotated_corners:
-        #     vertices.append([cx, cy, self.height])
-        #
-        # # Define faces (indices into vertices array)
-        # boundaries = [
-        #     [[0, 1, 2, 3]],  # bottom
-        #     [[4, 7, 6, 5]],  # top
-        #     [[0, 4, 5, 1]],  # front
-        #     [[2, 6, 7, 3]],  # back
-        #     [[0, 3, 7, 4]],  # left
-        #     [[1, 5, 6, 2]],  # right
-        # ]
-        #
-        # return vertices, boundaries
-
 # =========================================================================
 
 class BuildingGroup:
@@ -192,6 +263,7 @@ class BuildingGroup:
     _xr: float | None = None # rotation vertex x, y
     _yr: float | None = None
     _rotation: float | None = None
+    _ids: frozenset = frozenset()  # identities of the member buildings
 
     def __init__(self, buildings: List[Building]):
         self.buildings = buildings
@@ -206,7 +278,7 @@ class BuildingGroup:
         return len(self.buildings)
 
     def __contains__(self, item):
-        return item in self.buildings
+        return id(item) in self._ids
 
     def __iter__(self):
         return iter(self.buildings)
@@ -233,6 +305,7 @@ class BuildingGroup:
 
 
     def update_buildings(self):
+        self._ids = frozenset(id(b) for b in self.buildings)
         if len(self.buildings) == 0:
             self._x1 = self._y1 = None
             self._a = self._b = None
@@ -277,7 +350,7 @@ class BuildingGroup:
     def add(self, building: Building):
         """Add a building to the group,
         do nothing if building already in list"""
-        if not building in self.buildings:
+        if building not in self:
             self.buildings.append(building)
         self.update_buildings()
 
@@ -292,7 +365,7 @@ class BuildingGroup:
     def remove(self, building: Building):
         """Remove a building from the group,
         do nothing if building not in list"""
-        if building in self.buildings:
+        if building in self:
             self.buildings.remove(building)
         self.update_buildings()
 
@@ -339,13 +412,11 @@ class BuildingGroup:
         if corner_index != 0:
             old_x, old_y = self.get_corners()[corner_index]
             old_angle = math.atan2(old_y - self.y1, old_x - self.x1)
-            old_dist = math.sqrt((old_x - self.x1) ** 2 +
-                                 (old_y - self.y1) ** 2)
+            old_dist2 = (old_x - self.x1) ** 2 + (old_y - self.y1) ** 2
             new_angle = math.atan2(new_y - self.y1, new_x - self.x1)
-            new_dist = math.sqrt((new_x - self.x1) ** 2 +
-                                 (new_y - self.y1) ** 2)
+            new_dist2 = (new_x - self.x1) ** 2 + (new_y - self.y1) ** 2
             dr = new_angle - old_angle
-            scale = new_dist / old_dist
+            scale = math.sqrt(new_dist2 / old_dist2)
 
             for b in self.buildings:
                 # rotate building
@@ -439,13 +510,49 @@ def _get_corner_index(obj, x: float, y: float,
                      threshold: float = 10) -> Optional[int]:
     """Get which corner is near the point (0-3), None if no corner"""
     corners = obj.get_corners()
+    t2 = threshold * threshold
     for i, (cx, cy) in enumerate(corners):
-        if math.sqrt((x - cx) ** 2 + (y - cy) ** 2) < threshold:
+        dx = x - cx
+        dy = y - cy
+        if dx * dx + dy * dy < t2:
             return i
     return None
 
 # -------------------------------------------------------------------------
 
+@lru_cache(maxsize=16)
+def solid_faces(n: int) -> Tuple[Tuple[int, ...], ...]:
+    """Get the faces of a prism with n corners as vertex indices
+    (cached, shared between calls)"""
+    if n == 4:
+        return tuple(map(tuple, BLOCK_FACES.tolist()))
+    faces = [tuple(range(n)),  # bottom
+             (n,) + tuple(range(2 * n - 1, n, -1))]  # top
+    for i in range(n):  # sides
+        j = (i + 1) % n
+        faces.append((i, n + i, n + j, j))
+    return tuple(faces)
+
+# -------------------------------------------------------------------------
+
+def merge_vertices(vertices: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+    """Merge identical vertices of an (n, 3) array
+
+    :return: the distinct vertices, numbered in order of first appearance,
+        and the index of each input vertex among them
+    """
+    # keyed by the 24 bytes of each vertex (+ 0. turns -0. into 0.)
+    vertices = np.ascontiguousarray(vertices + 0., dtype='<f8')
+    keys = vertices.view(np.dtype((np.void, 24))).ravel()
+    _, first, inverse = np.unique(
+        keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return vertices[first[order]], rank[inverse.ravel()].tolist()
+
+# -------------------------------------------------------------------------
+
 def word_to_building(obj, x: float, y: float
                      ) -> tuple[float, float]:
     dx = x - obj.x1
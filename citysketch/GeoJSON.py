@@ -42,7 +42,7 @@ import re
 import uuid
 from typing import List, Tuple, Optional
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 import numpy as np
@@ -145,11 +145,11 @@ class GeoJsonBuildingCache(list):
         min_lat, min_lon = float('inf'), float('inf')
         max_lat, max_lon = float('-inf'), float('-inf')
         for building in self:
-            for lat, lon in building.coordinates:
-                min_lat = min(min_lat, lat)
-                max_lat = max(max_lat, lat)
-                min_lon = min(min_lon, lon)
-                max_lon = max(max_lon, lon)
+            b_min_lat, b_min_lon, b_max_lat, b_max_lon = building.bbox
+            min_lat = min(min_lat, b_min_lat)
+            max_lat = max(max_lat, b_max_lat)
+            min_lon = min(min_lon, b_min_lon)
+            max_lon = max(max_lon, b_max_lon)
         self.bounds = min_lat, min_lon, max_lat, max_lon
         self.count = len(self)
 
@@ -325,7 +325,7 @@ class GeoJsonBuildingCache(list):
 
 
 
-@dataclass
+@dataclass(slots=True)
 class GeoJsonBuilding:
     """
     Represents a building loaded from GeoJSON for preview and import.
@@ -363,6 +363,16 @@ class GeoJsonBuilding:
     height_variance: Optional[float] = None
     region: Optional[str] = None
     source: Optional[str] = None
+    # (min_lat, min_lon, max_lat, max_lon) of the polygon
+    bbox: Tuple[float, float, float, float] = field(
+        init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.coordinates:
+            lats, lons = zip(*self.coordinates)
+            self.bbox = min(lats), min(lons), max(lats), max(lons)
+        else:
+            self.bbox = math.inf, math.inf, -math.inf, -math.inf
 
     def contains_point(self, x: float, y: float) -> bool:
         """
@@ -375,6 +385,9 @@ class GeoJsonBuilding:
         :returns: True if the point is inside the polygon.
         :rtype: bool
         """
+        min_x, min_y, max_x, max_y = self.bbox
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return False
         n = len(self.coordinates)
         inside = False
         j = n - 1
@@ -402,6 +415,9 @@ class GeoJsonBuilding:
         :returns: True if polygon intersects the rectangle.
         :rtype: bool
         """
+        min_x, min_y, max_x, max_y = self.bbox
+        if max_x < lat1 or min_x > lat2 or max_y < lon1 or min_y > lon2:
+            return False
         # Check if any vertex is inside rect
         for x, y in self.coordinates:
             if lat1 <= x <= lat2 and lon1 <= y <= lon2:
@@ -452,11 +468,10 @@ class GeoJsonBuilding:
             rotation = math.atan2(dy, dx)
 
             # Calculate dimensions
-            a = math.sqrt(dx ** 2 + dy ** 2)  # width along first edge
+            a = math.hypot(dx, dy)  # width along first edge
             side2_dx = rect_coords[3][0] - rect_coords[0][0]
             side2_dy = rect_coords[3][1] - rect_coords[0][1]
-            b = math.sqrt(
-                side2_dx ** 2 + side2_dy ** 2)  # height along second edge
+            b = math.hypot(side2_dx, side2_dy)  # height along second edge
 
             # x1, y1 is the anchor point (first corner)
             x1, y1 = rect_coords[0]
@@ -472,9 +487,6 @@ class GeoJsonBuilding:
                 rotation=rotation
             )
 
-            if i == 0:
-                building.polygon_coords = self.coordinates
-
             buildings.append(building)
 
         return buildings
@@ -929,8 +941,8 @@ class BuildingMerger:
         v2 = (e2_end[0] - e2_start[0], e2_end[1] - e2_start[1])
 
         # Check if parallel (opposite direction for shared wall)
-        len1 = math.sqrt(v1[0] ** 2 + v1[1] ** 2)
-        len2 = math.sqrt(v2[0] ** 2 + v2[1] ** 2)
+        len1 = math.hypot(*v1)
+        len2 = math.hypot(*v2)
 
         if len1 < 0.001 or len2 < 0.001:
             return False
@@ -982,7 +994,7 @@ class BuildingMerger:
         dy = lon2 - lon1
 
         if dx == 0 and dy == 0:
-            return math.sqrt((x0 - lat1) ** 2 + (y0 - lon1) ** 2)
+            return math.hypot(x0 - lat1, y0 - lon1)
 
         t = ((x0 - lat1) * dx + (y0 - lon1) * dy) / (dx ** 2 + dy ** 2)
         t = max(0, min(1, t))
@@ -990,7 +1002,7 @@ class BuildingMerger:
         closest_x = lat1 + t * dx
         closest_y = lon1 + t * dy
 
-        return math.sqrt((x0 - closest_x) ** 2 + (y0 - closest_y) ** 2)
+        return math.hypot(x0 - closest_x, y0 - closest_y)
 
     @staticmethod
     def _project_point_on_line(point, line_start, line_end):
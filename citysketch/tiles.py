@@ -0,0 +1,52 @@
+"""
+Conversions between geographic positions and slippy map tile coordinates
+"""
+from functools import lru_cache
+import math
+
+# -------------------------------------------------------------------------
+
+@lru_cache(maxsize=128)
+def lat_lon_to_tile(lat: float, lon: float, zoom: int
+                    ) -> tuple[float, float]:
+    """
+    Converts Latitude/longitude (WGS84, https://epsg.io/4326) position
+    into (fractional) slippy map tile coordinates.
+
+    :param lat: latitude in degrees
+    :type lat: float
+    :param lon: longitude in degrees
+    :type lon: float
+    :param zoom: tile zoom level
+    :type zoom: int
+    :return: tile x and y coordinates
+    :rtype: tuple[float, float]
+    """
+    lat_rad = math.radians(lat)
+    n = 2.0 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+# -------------------------------------------------------------------------
+
+@lru_cache(maxsize=128)
+def tile_to_lat_lon(x: float, y: float, zoom: int) -> tuple[float, float]:
+    """
+    Converts (fractional) slippy map tile coordinates
+    into Latitude/longitude (WGS84, https://epsg.io/4326) position.
+
+    :param x: tile x coordinate
+    :type x: float
+    :param y: tile y coordinate
+    :type y: float
+    :param zoom: tile zoom level
+    :type zoom: int
+    :return: latitude in degrees, longitude in degrees
+    :rtype: tuple[float, float]
+    """
+    n = 2.0 ** zoom
+    lon = x / n * 360.0 - 180.0
+    lat_rad = math.atan(math.sinh(math.pi * (1 - 2 * y / n)))
+    lat = math.degrees(lat_rad)
+    return lat, lon
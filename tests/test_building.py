@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+import pytest
+
+from citysketch.Building import Building, merge_vertices
+
+
+@pytest.mark.parametrize('attr, value', [
+    ('x1', 7.), ('y1', -3.), ('a', 9.), ('b', 1.5), ('rotation', 0.5)])
+def test_corner_array_follows_footprint(attr, value):
+    building = Building('b', x1=1., y1=2., a=4., b=3., rotation=0.2)
+    before = building.get_corner_array()
+    assert building.get_corner_array() is before
+    assert not before.flags.writeable
+    setattr(building, attr, value)
+    after = building.get_corner_array()
+    assert after is not before
+    expected = Building('x', x1=building.x1, y1=building.y1, a=building.a,
+                        b=building.b, rotation=building.rotation)
+    np.testing.assert_allclose(after, expected.get_corner_array())
+
+
+def test_height_keeps_corners():
+    building = Building('b', x1=1., y1=2., a=4., b=3.)
+    corners = building.get_corners()
+    array = building.get_corner_array()
+    building.height = 25.
+    building.storeys = 8
+    assert building.get_corners() is corners
+    assert building.get_corner_array() is array
+
+
+def test_reset_corners():
+    building = Building('b', x1=1., y1=2., a=4., b=3.)
+    corners = building.get_corners()
+    array = building.get_corner_array()
+    building.reset_corners()
+    assert building.get_corners() is not corners
+    assert building.get_corners() == corners
+    assert building.get_corner_array() is not array
+
+
+def test_shift_moves_corners():
+    building = Building('b', x1=1., y1=2., a=4., b=3.)
+    before = building.get_corner_array()
+    building.shift(10., -5.)
+    np.testing.assert_allclose(building.get_corner_array(),
+                               before + [10., -5.])
+
+
+def test_merge_vertices_first_appearance():
+    vertices = np.array([
+        [2., 0., 0.], [1., 0., 0.], [2., 0., 0.], [0., 5., 1.], [1., 0., 0.],
+    ])
+    merged, to_global = merge_vertices(vertices)
+    np.testing.assert_array_equal(
+        merged, [[2., 0., 0.], [1., 0., 0.], [0., 5., 1.]])
+    assert to_global == [0, 1, 0, 2, 1]
+    np.testing.assert_array_equal(merged[to_global], vertices)
+
+
+def test_merge_vertices_empty():
+    merged, to_global = merge_vertices(np.zeros((0, 3)))
+    assert merged.shape == (0, 3)
+    assert to_global == []
+
+
+def test_merge_vertices_negative_zero():
+    vertices = np.array([[-0., 0., 1.], [0., -0., 1.], [0., 0., 1.]])
+    merged, to_global = merge_vertices(vertices)
+    assert to_global == [0, 0, 0]
+    assert merged.tolist() == [[0., 0., 1.]]
+    assert not np.signbit(merged).any()
+
+
+def test_from_corners_block():
+    corners = [(1., 2.), (4., 6.), (0., 9.), (-3., 5.)]
+    building = Building.from_corners('b', corners, height=12., storeys=4)
+    assert (building.x1, building.y1) == (1., 2.)
+    assert building.a == pytest.approx(5.)
+    assert building.b == pytest.approx(5.)
+    assert building.rotation == pytest.approx(math.atan2(4., 3.))
+    assert (building.height, building.storeys) == (12., 4)
+    np.testing.assert_allclose(building.get_corner_array(), corners,
+                               atol=1.e-12)
+
+
+def test_from_corners_cylinder():
+    n = 24
+    corners = [(10. + 3. * math.cos(2 * math.pi * i / n),
+                -5. + 3. * math.sin(2 * math.pi * i / n)) for i in range(n)]
+    building = Building.from_corners('c', corners)
+    assert building.a == 0.
+    assert building.b == pytest.approx(3.)
+    assert building.x1 == pytest.approx(10.)
+    assert building.y1 == pytest.approx(-5.)
+
+
+def test_blocks_from_corners_matches_from_corners():
+    corners = np.array([
+        [(0., 0., 0.), (2., 0., 0.), (2., 3., 0.), (0., 3., 0.)],
+        [(1., 1., 0.), (1., 5., 0.), (-2., 5., 0.), (-2., 1., 0.)],
+        [(5., 5., 2.), (8., 9., 2.), (4., 12., 2.), (1., 8., 2.)],
+    ])
+    ids, heights, storeys = ['a', 'b', 'c'], [10., 20., 30.], [1, 2, 3]
+    blocks = Building.blocks_from_corners(ids, corners, heights, storeys)
+    assert len(blocks) == 3
+    for block, args in zip(blocks, zip(ids, corners, heights, storeys)):
+        single = Building.from_corners(*args)
+        assert (block.id, block.height, block.storeys) == \
+               (single.id, single.height, single.storeys)
+        for attr in ('x1', 'y1', 'a', 'b', 'rotation'):
+            assert getattr(block, attr) == pytest.approx(getattr(single, attr))
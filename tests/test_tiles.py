@@ -0,0 +1,19 @@
+import pytest
+
+from citysketch.tiles import lat_lon_to_tile, tile_to_lat_lon
+
+
+@pytest.mark.parametrize('lat, lon', [
+    (0., 0.), (49.75, 6.64), (-33.87, 151.21), (84.5, -179.9)])
+@pytest.mark.parametrize('zoom', [0, 5, 17])
+def test_tile_round_trip(lat, lon, zoom):
+    x, y = lat_lon_to_tile(lat, lon, zoom)
+    assert 0. <= x <= 2 ** zoom and 0. <= y <= 2 ** zoom
+    assert tile_to_lat_lon(x, y, zoom) == pytest.approx((lat, lon))
+
+
+def test_tile_corners():
+    assert lat_lon_to_tile(0., 0., 1) == pytest.approx((1., 1.))
+    lat, lon = tile_to_lat_lon(0., 0., 3)
+    assert lon == pytest.approx(-180.)
+    assert lat == pytest.approx(85.0511287798)